@@ -7,9 +7,12 @@ from utils.logger import log
 from utils.config import Config
 
 from src.aio_calls import AioHttpCalls
+from src.block_cache import BlockCache
 from src.decoder import KeysUtils
 from src.mongodb import MongoDBHandler
 from src.blocks import Blocks
+from src.replay import Replay
+from src.backfill import Backfill
 from src.metrics import Metrics
 from src.excel import Excel
 
@@ -26,9 +29,24 @@ async def main():
     log.info(f"Setting default_bech32_prefix for KeysUtils to {config.bech_32_prefix}")
     KeysUtils.default_bech32_prefix = config.bech_32_prefix
     
+    # Only ingestion writes the block cache, replay opens its own readers and the other subcommands only read it
+    block_cache = None
+    if config.block_cache_dir and args.subcommand == "blocks":
+        if not args.replay and not args.rebuild_rollups:
+            block_cache = BlockCache(path=config.block_cache_dir)
+    elif config.block_cache_dir:
+        block_cache = BlockCache(path=config.block_cache_dir, read_only=True)
+
     async with MongoDBHandler(config) as mongo, \
-               AioHttpCalls(api=config.api, rpc=config.rpc) as aio_session:
-        if args.subcommand == "blocks":
+               AioHttpCalls(api=config.api, rpc=config.rpc, block_cache=block_cache, **config.http.model_dump()) as aio_session:
+        if args.subcommand == "blocks" and args.rebuild_rollups:
+            await mongo.rebuild_rollups()
+            return
+        elif args.subcommand == "blocks" and args.replay:
+            app = Replay(config=config, mongo=mongo, source=args.replay)
+        elif args.subcommand == "blocks" and args.shards > 1:
+            app = Backfill(config=config, aio_session=aio_session, mongo=mongo, shards=args.shards)
+        elif args.subcommand == "blocks":
             app = Blocks(config=config, aio_session=aio_session, mongo=mongo)
         elif args.subcommand == "metrics":
             app = Metrics(config=config, aio_session=aio_session, mongo=mongo, metric=args.metric)
@@ -0,0 +1,188 @@
+import numpy as np
+from itertools import groupby
+
+class DayAccumulator:
+    """
+    Per-day validator counters stored column-wise in NumPy arrays.
+
+    Every hex address gets a stable column index the first time it is seen, and the index array of a
+    valset is computed once per validators_hash and day. Blocks are turned into boolean bitmaps over their valset
+    and a whole run of blocks is added with one vectorised sum per counter.
+    """
+
+    FIELDS = ('proposed_blocks', 'signed_blocks', 'missed_blocks', 'signed_oracle', 'missed_oracle')
+    PROPOSED, SIGNED, MISSED, SIGNED_ORACLE, MISSED_ORACLE = range(len(FIELDS))
+
+    def __init__(self, capacity: int = 256):
+        self.hexes = []
+        self.indices = {}
+        self.valset_indices = {}
+        self.counters = np.zeros((len(self.FIELDS), capacity), dtype=np.int64)
+        self.active = np.zeros(capacity, dtype=bool)
+
+    def index_of(self, hex: str) -> int:
+        index = self.indices.get(hex)
+        if index is None:
+            index = len(self.hexes)
+            if index == self.active.size:
+                self.counters = np.pad(self.counters, ((0, 0), (0, index)))
+                self.active = np.pad(self.active, (0, index))
+            self.indices[hex] = index
+            self.hexes.append(hex)
+        return index
+
+    def get_valset_indices(self, validators_hash: str, valset: list[str]) -> np.ndarray:
+        indices = self.valset_indices.get(validators_hash)
+        if indices is None:
+            indices = np.fromiter((self.index_of(hex) for hex in valset), dtype=np.int64, count=len(valset))
+            self.valset_indices[validators_hash] = indices
+        return indices
+
+    def block_bitmaps(self, height: int, valset: list[str], validators_hash: str, signatures: list[str], proposer: str, oracle_votes: dict) -> dict:
+        """
+        Returns the block as bitmaps over its valset order, plus the validators missing from the vote extension.
+        Oracle votes are True (prices), False (no prices) or absent.
+        """
+        signed = set(signatures)
+        votes = [oracle_votes.get(hex) for hex in valset]
+        return {
+            'height': height,
+            'validators_hash': validators_hash,
+            'indices': self.get_valset_indices(validators_hash, valset),
+            'signed': np.fromiter((hex in signed for hex in valset), dtype=bool, count=len(valset)),
+            'oracle_signed': np.fromiter((vote is True for vote in votes), dtype=bool, count=len(valset)),
+            'oracle_missed': np.fromiter((vote is False for vote in votes), dtype=bool, count=len(valset)),
+            'proposer': valset.index(proposer) if proposer in valset else -1,
+            'missing_oracle': [hex for hex, vote in zip(valset, votes) if vote is None],
+        }
+
+    def add_blocks(self, bitmaps: list[dict]):
+        """Adds a run of blocks of the same day, summing the bitmaps of every valset in one go."""
+        by_valset = {}
+        for block in bitmaps:
+            by_valset.setdefault(block['validators_hash'], []).append(block)
+
+        for blocks in by_valset.values():
+            indices = blocks[0]['indices']
+            signed = np.sum([block['signed'] for block in blocks], axis=0)
+            self.counters[self.SIGNED, indices] += signed
+            self.counters[self.MISSED, indices] += len(blocks) - signed
+            self.counters[self.SIGNED_ORACLE, indices] += np.sum([block['oracle_signed'] for block in blocks], axis=0)
+            self.counters[self.MISSED_ORACLE, indices] += np.sum([block['oracle_missed'] for block in blocks], axis=0)
+
+            proposers = [block['proposer'] for block in blocks if block['proposer'] >= 0]
+            np.add.at(self.counters[self.PROPOSED], indices[proposers], 1)
+            self.active[indices] = True
+
+    def pack_runs(self, bitmaps: list[dict]) -> list[dict]:
+        """
+        Packs per-block bitmaps into compact runs of consecutive blocks sharing a valset.
+        Every bitmap is stored as ceil(valset / 8) bytes per block, rows in height order.
+        """
+        runs = []
+        for validators_hash, run in groupby(bitmaps, key=lambda block: block['validators_hash']):
+            run = list(run)
+            runs.append({
+                'start_height': run[0]['height'],
+                'end_height': run[-1]['height'],
+                'validators_hash': validators_hash,
+                'validators': len(run[0]['signed']),
+                'signed': np.packbits([block['signed'] for block in run], axis=1).tobytes(),
+                'oracle_signed': np.packbits([block['oracle_signed'] for block in run], axis=1).tobytes(),
+                'oracle_missed': np.packbits([block['oracle_missed'] for block in run], axis=1).tobytes(),
+                'proposers': np.array([block['proposer'] for block in run], dtype=np.int16).tobytes(),
+            })
+        return runs
+
+    def unpack_run(self, run: dict, valset: list[str]) -> list[dict]:
+        """Turns a stored run back into per-block bitmaps that add_blocks accepts. valset is the list stored for run['validators_hash']."""
+        blocks = run['end_height'] - run['start_height'] + 1
+        size = run['validators']
+        indices = self.get_valset_indices(run['validators_hash'], valset)
+
+        def unpack(field):
+            rows = np.frombuffer(run[field], dtype=np.uint8).reshape(blocks, -1)
+            return np.unpackbits(rows, axis=1, count=size).astype(bool)
+
+        signed, oracle_signed, oracle_missed = unpack('signed'), unpack('oracle_signed'), unpack('oracle_missed')
+        proposers = np.frombuffer(run['proposers'], dtype=np.int16)
+        return [
+            {
+                'height': run['start_height'] + row,
+                'validators_hash': run['validators_hash'],
+                'indices': indices,
+                'signed': signed[row],
+                'oracle_signed': oracle_signed[row],
+                'oracle_missed': oracle_missed[row],
+                'proposer': int(proposers[row]),
+                'missing_oracle': [],
+            }
+            for row in range(blocks)
+        ]
+
+    def to_stats(self) -> dict:
+        """Returns the day in the daily_validator_stats shape: {hex: {field: count}} for validators seen that day."""
+        active = np.flatnonzero(self.active[:len(self.hexes)])
+        columns = self.counters[:, active].T.tolist()
+        return {
+            self.hexes[index]: dict(zip(self.FIELDS, counters))
+            for index, counters in zip(active.tolist(), columns)
+        }
+
+    def load_stats(self, stats: dict):
+        """Adds a to_stats() result back into the counters, e.g. a partial day restored from a checkpoint."""
+        for hex, counters in stats.items():
+            index = self.index_of(hex)
+            self.counters[:, index] += [counters[field] for field in self.FIELDS]
+            self.active[index] = True
+
+    @classmethod
+    def merge_stats(cls, first: dict, second: dict) -> dict:
+        """Sums two to_stats() results of the same day, e.g. the two halves of a day split between shards."""
+        merged = {hex: dict(counters) for hex, counters in first.items()}
+        for hex, counters in second.items():
+            if hex in merged:
+                for field in cls.FIELDS:
+                    merged[hex][field] += counters[field]
+            else:
+                merged[hex] = dict(counters)
+        return merged
+
+    def clear(self):
+        """Zeroes the counters for a new day and drops the valset index cache, hashes seen again are reindexed."""
+        self.counters[:] = 0
+        self.active[:] = False
+        self.valset_indices.clear()
+
+
+if __name__ == "__main__":
+    import os
+    import time
+
+    # Per-block cost should stay flat per validator as the valset grows, i.e. linear per block
+    blocks = 2000
+    for size in (50, 100, 200, 400, 800):
+        valset = [os.urandom(20).hex().upper() for _ in range(size)]
+        signatures = valset[: size * 9 // 10]
+        oracle_votes = {hex: True for hex in valset}
+
+        accumulator = DayAccumulator()
+        started = time.perf_counter()
+        run = [
+            accumulator.block_bitmaps(height=height, valset=valset, validators_hash="hash", signatures=signatures, proposer=valset[0], oracle_votes=oracle_votes)
+            for height in range(blocks)
+        ]
+        accumulator.add_blocks(run)
+        columnar = (time.perf_counter() - started) / blocks
+
+        # Previous approach: list membership and setdefault with a new dict per validator
+        validators = {}
+        started = time.perf_counter()
+        for _ in range(blocks // 10):
+            for hex in valset:
+                validators.setdefault(hex, dict.fromkeys(DayAccumulator.FIELDS, 0))
+                if hex in signatures:
+                    validators[hex]['signed_blocks'] += 1
+        listed = (time.perf_counter() - started) / (blocks // 10)
+
+        print(f"{size:>4} validators: {columnar * 1e6:8.1f}us per block ({columnar / size * 1e9:5.0f}ns per validator) | list lookup {listed * 1e6:8.1f}us per block ({listed / size * 1e9:6.0f}ns per validator)")
@@ -1,6 +1,11 @@
 import aiohttp
+import asyncio
+import time
 import traceback
 from utils.logger import log
+from src.endpoints import EndpointPool
+from src.json_decoder import get_json_loads, trim_block, strip_signatures
+from src.retry import RetryBudget, backoff_delay
 from urllib.parse import quote
 from typing import Literal, Optional
 class AioHttpCalls:
@@ -9,32 +14,163 @@ class AioHttpCalls:
                  self,
                  api,
                  rpc,
-                 timeout = 10
+                 timeout = 10,
+                 connect_timeout = 5,
+                 pool_size = 100,
+                 pool_size_per_host = 0,
+                 keepalive_timeout = 30,
+                 dns_cache_ttl = 300,
+                 retry_attempts = 5,
+                 retry_base_delay = 0.1,
+                 retry_max_delay = 5.0,
+                 retry_budget_ratio = 0.2,
+                 retry_budget_capacity = 20,
+                 retry_budget_refill = 1.0,
+                 circuit_failures = 5,
+                 circuit_cooldown = 30,
+                 json_decoder = 'auto',
+                 partial_json = True,
+                 block_cache = None
                  ):
                  
-        self.api = api
-        self.rpc = rpc
-        self.timeout = timeout
+        self.api_endpoints = EndpointPool(api, circuit_failures=circuit_failures, circuit_cooldown=circuit_cooldown)
+        self.rpc_endpoints = EndpointPool(rpc, circuit_failures=circuit_failures, circuit_cooldown=circuit_cooldown)
+        self.retry_attempts = retry_attempts
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.retry_budget = RetryBudget(ratio=retry_budget_ratio, capacity=retry_budget_capacity, refill=retry_budget_refill)
+        self.json_decoder, self.json_loads = get_json_loads(json_decoder)
+        self.json_stats = {'responses': 0, 'bytes': 0, 'seconds': 0.0}
+        self.partial_json = partial_json
+        self.block_cache = block_cache
+        self.timeout = aiohttp.ClientTimeout(total=timeout, connect=connect_timeout)
+        self.pool_size = pool_size
+        self.pool_size_per_host = pool_size_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
         self.session = None
+        self.request_listeners = []
+        self.connection_stats = {
+            'requests': 0,
+            'connections_created': 0,
+            'connections_reused': 0,
+            'dns_cache_hits': 0,
+            'dns_cache_misses': 0,
+        }
 
     async def __aenter__(self):
-        self.session = aiohttp.ClientSession()
-        log.info("✅ Created AioHttp session")
+        connector = aiohttp.TCPConnector(
+            limit=self.pool_size,
+            limit_per_host=self.pool_size_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+            ttl_dns_cache=self.dns_cache_ttl,
+            use_dns_cache=True,
+        )
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=self.timeout,
+            trace_configs=[self.create_trace_config()]
+        )
+        log.info(f"✅ Created AioHttp session (pool {self.pool_size}, per host {self.pool_size_per_host or 'unlimited'}, keepalive {self.keepalive_timeout}s, json decoder {self.json_decoder})")
         return self
 
     async def __aexit__(self, exc_type, exc_value, traceback):
+        log.info(f"AioHttp connection stats: {self.connection_stats}")
+        if self.json_stats['responses']:
+            log.info(f"Decoded {self.json_stats['responses']} JSON responses ({self.json_stats['bytes'] / 1024 / 1024:.1f}MB) with {self.json_decoder} in {self.json_stats['seconds']:.2f}s ({self.json_stats['seconds'] / self.json_stats['responses'] * 1000:.3f}ms per response)")
+        if self.retry_budget.exhausted:
+            log.warning(f"Retry budget was exhausted {self.retry_budget.exhausted} time(s), those retries waited for a token")
+        for endpoint in [*self.rpc_endpoints, *self.api_endpoints]:
+            log.info(f"Endpoint stats: {endpoint} | {endpoint.requests} requests")
+        if self.block_cache:
+            self.block_cache.close()
         log.info("🛑 AioHttp connection closed.")
         await self.session.close()
+
+    def create_trace_config(self) -> aiohttp.TraceConfig:
+        """Counts requests, new vs reused pooled connections and DNS cache hits into connection_stats."""
+        trace_config = aiohttp.TraceConfig()
+
+        def count(key):
+            async def on_event(session, context, params):
+                self.connection_stats[key] += 1
+            return on_event
+
+        trace_config.on_request_start.append(count('requests'))
+        trace_config.on_connection_create_end.append(count('connections_created'))
+        trace_config.on_connection_reuseconn.append(count('connections_reused'))
+        trace_config.on_dns_cache_hit.append(count('dns_cache_hits'))
+        trace_config.on_dns_cache_miss.append(count('dns_cache_misses'))
+        return trace_config
     
-    async def handle_request(self, url, callback,):
+    async def fetch_with_retry(self, description: str, request, is_valid=lambda result: 'result' in result):
+        """
+        Awaits request() until is_valid(result), sleeping with exponential backoff and full jitter between attempts.
+        Retries are drawn from a session-wide budget, so a failing node gets no more than a fraction of extra traffic.
+        When the budget is spent a retry waits for its token, it never gives up before retry_attempts.
+        """
+        for attempt in range(self.retry_attempts):
+            try:
+                result = await request()
+                if result and is_valid(result):
+                    self.retry_budget.deposit()
+                    if attempt > 0:
+                        log.info(f"Successfully fetched {description} after {attempt + 1} attempt(s).")
+                    return result
+                else:
+                    raise ValueError("Invalid response")
+            except Exception as e:
+                if attempt == self.retry_attempts - 1:
+                    log.error(f"Failed to fetch {description} after {attempt + 1} attempt(s).")
+                    return
+
+                delay = backoff_delay(attempt=attempt, base=self.retry_base_delay, cap=self.retry_max_delay)
+                log.warning(f"Retrying {description} request (attempt {attempt + 1}) in {delay:.2f}s due to: {e}")
+                await asyncio.sleep(delay)
+                waited = await self.retry_budget.withdraw()
+                if waited:
+                    log.debug(f"Retry of {description} waited {waited:.2f}s for the retry budget")
+
+    async def read_json(self, response: aiohttp.ClientResponse, trim=None):
+        body = await response.read()
+        started = time.perf_counter()
+        data = self.json_loads(trim(body) if trim and self.partial_json else body)
+        self.json_stats['seconds'] += time.perf_counter() - started
+        self.json_stats['responses'] += 1
+        self.json_stats['bytes'] += len(body)
+        return data
+
+    def rpc_url(self, height: int = None) -> str:
+        return self.rpc_endpoints.pick(height=height).url
+
+    def api_url(self) -> str:
+        return self.api_endpoints.pick().url
+
+    async def handle_request(self, url, callback, payload=None, trim=None):
+        endpoint = self.rpc_endpoints.find(url) or self.api_endpoints.find(url)
+        ok = False
+        status = None
+        started = time.perf_counter()
+        if endpoint:
+            await endpoint.wait_closed()
+            endpoint.in_flight += 1
+
         try:
             log.debug(f"Requesting {url}")
-            async with self.session.get(url, timeout=self.timeout) as response:
-                
+            if payload is None:
+                request = self.session.get(url)
+            else:
+                request = self.session.post(url, json=payload)
+
+            async with request as response:
+                status = response.status
+
                 if 200 <= response.status < 300:
-                    return await callback(response.json())
+                    ok = True
+                    return await callback(self.read_json(response, trim=trim))
                 elif response.status == 500 and '/block?height=1' in url:
-                    return await callback(response.json())
+                    ok = True
+                    return await callback(self.read_json(response, trim=trim))
                 else:
                     log.debug(f"Request to {url} failed with status code {response.status}")
                 
@@ -47,10 +183,18 @@ class AioHttpCalls:
         except Exception as e:
             log.debug(f"An unexpected error occurred: {e}")
             traceback.print_exc()
+
+        finally:
+            elapsed = time.perf_counter() - started
+            if endpoint:
+                endpoint.in_flight -= 1
+                endpoint.record(elapsed=elapsed, ok=ok)
+            for listener in self.request_listeners:
+                listener(elapsed=elapsed, status=status)
     
 
-    async def get_rpc_status(self):
-        url = f"{self.rpc}/status"
+    async def get_rpc_status(self, url: str = None):
+        url = f"{url or self.rpc_url()}/status"
 
         async def process_response(response):
             data = await response
@@ -58,8 +202,13 @@ class AioHttpCalls:
 
         return await self.handle_request(url, process_response)
 
+    async def get_rpc_statuses(self) -> list[tuple[str, dict]]:
+        """Queries /status on every RPC endpoint and returns (url, status) pairs, status is None for endpoints that failed."""
+        statuses = await asyncio.gather(*(self.get_rpc_status(url=endpoint.url) for endpoint in self.rpc_endpoints))
+        return [(endpoint.url, status) for endpoint, status in zip(self.rpc_endpoints, statuses)]
+
     async def get_api_status(self):
-        url = f"{self.api}/cosmos/base/node/v1beta1/status"
+        url = f"{self.api_url()}/cosmos/base/node/v1beta1/status"
 
         async def process_response(response):
             data = await response
@@ -68,7 +217,7 @@ class AioHttpCalls:
         return await self.handle_request(url, process_response)
     
     async def get_total_delegators(self, valoper: str) -> str:
-        url = f"{self.api}/initia/mstaking/v1/validators/{valoper}/delegations?pagination.count_total=true"
+        url = f"{self.api_url()}/initia/mstaking/v1/validators/{valoper}/delegations?pagination.count_total=true"
         
         async def process_response(response):
             data = await response
@@ -77,7 +226,7 @@ class AioHttpCalls:
         return await self.handle_request(url, process_response)
     
     async def get_validator_tomb(self, valcons: str) -> dict:
-        url = f"{self.api}/cosmos/slashing/v1beta1/signing_infos/{valcons}"
+        url = f"{self.api_url()}/cosmos/slashing/v1beta1/signing_infos/{valcons}"
 
         async def process_response(response):
             data = await response
@@ -86,7 +235,7 @@ class AioHttpCalls:
         return await self.handle_request(url, process_response)
     
     async def get_validator_creation_block(self, valoper: str) -> dict:
-        url=f"{self.rpc}/tx_search?query=%22create_validator.validator=%27{valoper}%27%22"
+        url=f"{self.rpc_url()}/tx_search?query=%22create_validator.validator=%27{valoper}%27%22"
 
         async def process_response(response):
             data = await response
@@ -100,7 +249,7 @@ class AioHttpCalls:
     async def get_gov_vote_tx(self, wallet: str, proposal_id: int) -> dict:
         # url=f"{self.rpc}/tx_search?query=%22proposal_vote.voter=%27{wallet}%27%22"
 
-        url=f"{self.rpc}/tx_search?query=%22proposal_vote.voter=%27{wallet}%27 AND proposal_vote.proposal_id=%27{proposal_id}%27%22"
+        url=f"{self.rpc_url()}/tx_search?query=%22proposal_vote.voter=%27{wallet}%27 AND proposal_vote.proposal_id=%27{proposal_id}%27%22"
         
         async def process_response(response):
             data = await response
@@ -140,7 +289,7 @@ class AioHttpCalls:
         next_key: Optional[str] = None,
     ) -> dict:
 
-        url = f"{self.api}/initia/gov/v1/proposals?pagination.limit={pagination_limit}"
+        url = f"{self.api_url()}/initia/gov/v1/proposals?pagination.limit={pagination_limit}"
 
         if status:
             url += f"&proposal_status={quote(status)}"
@@ -165,7 +314,7 @@ class AioHttpCalls:
         pagination_limit: int = 100,
         next_key: Optional[str] = None,
     ) -> dict:
-        url = f"{self.api}/initia/mstaking/v1/validators?pagination.limit={pagination_limit}"
+        url = f"{self.api_url()}/initia/mstaking/v1/validators?pagination.limit={pagination_limit}"
 
         if status:
             url += f"&status={quote(status)}"
@@ -178,7 +327,7 @@ class AioHttpCalls:
         return await self.handle_request(url, process_response)
 
     async def get_slashing_events(self, valcons: str) -> dict:
-        url = f'{self.rpc}/block_search?query="slash.address%3D%27{valcons}%27"'
+        url = f'{self.rpc_url()}/block_search?query="slash.address%3D%27{valcons}%27"'
 
         async def process_response(response):
             data = await response
@@ -187,7 +336,7 @@ class AioHttpCalls:
         return await self.handle_request(url, process_response)
     
     async def get_valset_at_block(self, height):
-        url = f"{self.api}/cosmos/base/tendermint/v1beta1/validatorsets/{height}?&pagination.limit=100000"
+        url = f"{self.api_url()}/cosmos/base/tendermint/v1beta1/validatorsets/{height}?&pagination.limit=100000"
         
         async def process_response(response):
             data = await response
@@ -198,16 +347,30 @@ class AioHttpCalls:
         
         return await self.handle_request(url, process_response)
     
+    def get_cached(self, kind: Literal['commit', 'block'], height: int) -> dict | None:
+        if self.block_cache:
+            return self.block_cache.get(kind, height)
+
+    def put_cached(self, kind: Literal['commit', 'block'], height: int, data: dict | None):
+        if self.block_cache and data and 'result' in data:
+            self.block_cache.put(kind, height, data)
+
     async def get_block(self, height):
-        url = f"{self.rpc}/commit?height={height}"
+        cached = self.get_cached('commit', height)
+        if cached:
+            return cached
+
+        url = f"{self.rpc_url(height)}/commit?height={height}"
 
         async def process_response(response):
             data = await response
             return data
-        return await self.handle_request(url, process_response)
+        data = await self.handle_request(url, process_response, trim=strip_signatures)
+        self.put_cached('commit', height, data)
+        return data
 
     async def get_valset_at_block(self, height, page):
-        url = f"{self.rpc}/validators?height={height}&page={page}&per_page=100"
+        url = f"{self.rpc_url(height)}/validators?height={height}&page={page}&per_page=100"
 
         async def process_response(response):
             data = await response
@@ -216,16 +379,32 @@ class AioHttpCalls:
         return await self.handle_request(url, process_response)
 
     async def get_block_details(self, height):
-        url = f"{self.rpc}/block?height={height}"
+        cached = self.get_cached('block', height)
+        if cached:
+            return cached
+
+        url = f"{self.rpc_url(height)}/block?height={height}"
         
         async def process_response(response):
             data = await response
             return data
         
-        return await self.handle_request(url, process_response)
+        data = await self.handle_request(url, process_response, trim=trim_block)
+        self.put_cached('block', height, data)
+        return data
     
     async def get_rpc_lowest_height(self):
-        url = f"{self.rpc}/block?height=1"
+        """Checks the pruning window of every RPC endpoint and returns the lowest height available on any of them."""
+        lowest_heights = await asyncio.gather(*(
+            self.get_endpoint_lowest_height(url=endpoint.url) for endpoint in self.rpc_endpoints
+        ))
+        for endpoint, lowest_height in zip(self.rpc_endpoints, lowest_heights):
+            endpoint.lowest_height = lowest_height
+            log.debug(f"{endpoint.url} lowest height: {lowest_height}")
+        return self.rpc_endpoints.lowest_height
+
+    async def get_endpoint_lowest_height(self, url: str):
+        url = f"{url}/block?height=1"
 
         async def process_response(response):
             data = await response
@@ -238,4 +417,68 @@ class AioHttpCalls:
             
             return int(data.get('result', {}).get('block', {}).get('header', {}).get('height'))
                 
-        return await self.handle_request(url, process_response)
\ No newline at end of file
+        return await self.handle_request(url, process_response)
+
+    async def rpc_batch(self, method: str, heights: list[int], fetch_single) -> dict:
+        """
+        Packs one JSON-RPC 2.0 call per height into batch POSTs and returns {height: response}.
+        Heights a batch did not answer are fetched with single GET requests.
+        Heights found in the block cache are served from disk and left out of the request.
+        """
+        cached = {height: self.get_cached(method, height) for height in heights}
+        cached = {height: data for height, data in cached.items() if data}
+        heights = [height for height in heights if height not in cached]
+        if not heights:
+            return cached
+
+        endpoint = self.rpc_endpoints.pick(height=min(heights))
+        results = {}
+        if endpoint.batch_supported:
+            results = await self.post_batches(endpoint=endpoint, method=method, heights=heights)
+
+        missing = [height for height in heights if height not in results]
+        singles = await asyncio.gather(*(fetch_single(height=height) for height in missing))
+        return {**cached, **results, **dict(zip(missing, singles))}
+
+    async def post_batches(self, endpoint, method: str, heights: list[int]) -> dict:
+        """
+        POSTs heights in JSON-RPC batches of at most endpoint.max_batch_size calls and returns {height: response} of the answered ones.
+        CometBFT rejects a batch larger than its max_request_batch_size (10 by default) with a single error object,
+        so a rejected batch is halved and sent again and the smaller size is kept for the endpoint.
+        Only a rejected batch of one call turns batching off for the endpoint.
+        """
+        async def process_response(response):
+            data = await response
+            return data
+
+        trim = {"block": trim_block, "commit": strip_signatures}.get(method)
+        results = {}
+        position = 0
+        while position < len(heights) and endpoint.batch_supported:
+            chunk = heights[position:position + (endpoint.max_batch_size or len(heights))]
+            payload = [
+                {"jsonrpc": "2.0", "id": height, "method": method, "params": {"height": str(height)}}
+                for height in chunk
+            ]
+            data = await self.handle_request(endpoint.url, process_response, payload=payload, trim=trim)
+            if isinstance(data, list):
+                for item in data:
+                    if 'id' in item:
+                        results[int(item['id'])] = item
+                        self.put_cached(method, int(item['id']), item)
+                position += len(chunk)
+            elif data is None:
+                break
+            elif len(chunk) > 1:
+                endpoint.max_batch_size = len(chunk) // 2
+                log.warning(f"{endpoint.url} rejected a JSON-RPC batch of {len(chunk)} calls. Retrying in batches of {endpoint.max_batch_size}")
+            else:
+                log.warning(f"{endpoint.url} rejected JSON-RPC batch request. Falling back to single requests")
+                endpoint.batch_supported = False
+        return results
+
+    async def get_blocks_batch(self, heights: list[int]) -> dict:
+        return await self.rpc_batch(method="block", heights=heights, fetch_single=self.get_block_details)
+
+    async def get_commits_batch(self, heights: list[int]) -> dict:
+        return await self.rpc_batch(method="commit", heights=heights, fetch_single=self.get_block)
@@ -0,0 +1,158 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from sys import exit
+
+from utils.config import Config
+from utils.logger import log
+
+from src.aggregator import DayAccumulator
+from src.aio_calls import AioHttpCalls
+from src.block_cache import BlockCache
+from src.blocks import Blocks
+from src.mongodb import MongoDBHandler
+
+class ShardBlocks(Blocks):
+    """
+    Blocks pipeline over one height range [start_height, end_height) inside a shard process.
+    Days are collected instead of written, the first and last of them may be partial.
+    """
+
+    def __init__(
+        self,
+        config: Config,
+        aio_session: AioHttpCalls,
+        mongo: MongoDBHandler,
+        start_height: int,
+        end_height: int
+    ):
+        super().__init__(config=config, aio_session=aio_session, mongo=mongo)
+        self.app_start_height = self.day_start_height = start_height
+        self.app_end_height = end_height
+        self.app_blocks_batch_size = config.blocks_batch_size
+        self.app_sleep_between_blocks_batch = config.sleep_between_blocks_batch
+        self.checkpoint_interval = 0
+        self.days = []
+
+    async def run(self) -> list[dict]:
+        start_block = await self.get_commit(height=self.app_start_height)
+        if not start_block:
+            log.error(f"Failed to query shard start block: {self.app_start_height}")
+            exit(5)
+        self.app_current_date = start_block['result']['signed_header']['header']['time'].split('T')[0]
+        self.set_concurrency()
+
+        await self.parse_blocks_batches()
+        await self.store_day()
+        log.info(f"Shard {self.app_start_height} -> {self.app_end_height} finished with {len(self.days)} day(s)")
+        return self.days
+
+    async def write_day(
+        self,
+        date: str,
+        date_start_height: int,
+        date_end_height: int,
+        stats: dict,
+        runs: list[dict] = None,
+        times: list[str] = None
+    ):
+        self.days.append({
+            'date': date,
+            'date_start_height': date_start_height,
+            'date_end_height': date_end_height,
+            'stats': stats,
+            'runs': runs,
+            'times': times,
+        })
+
+async def backfill_heights(config: Config, start_height: int, end_height: int, lowest_heights: list[int | None]) -> list[dict]:
+    # The block cache has a single writer, so shards only read heights cached by earlier runs
+    block_cache = BlockCache(path=config.block_cache_dir, read_only=True) if config.block_cache_dir else None
+    async with MongoDBHandler(config) as mongo, \
+               AioHttpCalls(api=config.api, rpc=config.rpc, block_cache=block_cache, **config.http.model_dump()) as aio_session:
+        # Pruning windows probed by the coordinator, so heights are routed to endpoints that still have them
+        for endpoint, lowest_height in zip(aio_session.rpc_endpoints, lowest_heights):
+            endpoint.lowest_height = lowest_height
+        return await ShardBlocks(config=config, aio_session=aio_session, mongo=mongo, start_height=start_height, end_height=end_height).run()
+
+def backfill_shard(config: Config, start_height: int, end_height: int, lowest_heights: list[int | None]) -> list[dict]:
+    """Process pool entry point. Every shard runs its own event loop, RPC session and MongoDB client."""
+    return asyncio.run(backfill_heights(config=config, start_height=start_height, end_height=end_height, lowest_heights=lowest_heights))
+
+def stitch_days(first: dict, second: dict) -> dict:
+    """Joins the two halves of a day split at a shard boundary."""
+    runs = None
+    if first['runs'] is not None:
+        runs = first['runs'] + second['runs']
+    return {
+        'date': first['date'],
+        'date_start_height': first['date_start_height'],
+        'date_end_height': second['date_end_height'],
+        'stats': DayAccumulator.merge_stats(first['stats'], second['stats']),
+        'runs': runs,
+        'times': first['times'] + second['times'],
+    }
+
+class Backfill(Blocks):
+    """
+    Coordinator for the blocks subcommand that splits [app_start_height, app_end_height) into shards,
+    backfills each one in its own process and writes the days in height order.
+
+    Shard bounds are moved back to the first height of their UTC date, so shards hold whole days.
+    A day that still spans a shard boundary comes back as two partial days and is stitched before it is written.
+    The last day is left unwritten, like the day a single-process run stops at, so the next run picks it up.
+    """
+
+    def __init__(self, config: Config, aio_session: AioHttpCalls, mongo: MongoDBHandler, shards: int):
+        super().__init__(config=config, aio_session=aio_session, mongo=mongo)
+        self.shards = shards
+        # Shards start from day boundaries, a mid-day checkpoint can not be handed to them
+        self.checkpoint_interval = 0
+
+    async def shard_bounds(self) -> list[int]:
+        heights = self.app_end_height - self.app_start_height
+        shards = max(1, min(self.shards, heights))
+
+        bounds = [self.app_start_height]
+        for i in range(1, shards):
+            height = self.app_start_height + heights * i // shards
+            date = await self.block_times.get_date(height=height)
+            if not date:
+                log.error(f"Failed to query shard bound block: {height}")
+                exit(5)
+            height = await self.block_times.first_height_of_date(date=date, low=bounds[-1], high=height)
+            if height > bounds[-1]:
+                bounds.append(height)
+        bounds.append(self.app_end_height)
+        return bounds
+
+    async def start(self):
+        await self.check_rpc_status()
+        await self.set_intial_all_vars()
+
+        bounds = await self.shard_bounds()
+        log.info(f"Backfilling {self.app_start_height} -> {self.app_end_height} in {len(bounds) - 1} shards: {bounds}")
+
+        lowest_heights = [endpoint.lowest_height for endpoint in self.aio_session.rpc_endpoints]
+        loop = asyncio.get_running_loop()
+        pending_day = None
+        try:
+            with ProcessPoolExecutor(max_workers=len(bounds) - 1) as executor:
+                shards = [
+                    loop.run_in_executor(executor, backfill_shard, self.config, start_height, end_height, lowest_heights)
+                    for start_height, end_height in zip(bounds, bounds[1:])
+                ]
+
+                for shard in shards:
+                    for day in await shard:
+                        if pending_day and pending_day['date'] == day['date']:
+                            pending_day = stitch_days(pending_day, day)
+                            continue
+
+                        if pending_day:
+                            await self.write_day(**pending_day)
+                        pending_day = day
+        finally:
+            await self.writer.close()
+
+        if pending_day:
+            log.info(f"Backfill finished. Last day {pending_day['date']} ({pending_day['date_start_height']} -> {pending_day['date_end_height']}) is left for the next run")
@@ -0,0 +1,293 @@
+import fcntl
+import json
+import mmap
+import os
+import struct
+import numpy as np
+import zstd
+from sys import exit
+from utils.logger import log
+
+RECORD_HEADER = struct.Struct('<QI')
+# Sidecar index entry of a record: its height, payload offset in the segment and payload length
+INDEX_DTYPE = np.dtype([('height', '<u8'), ('offset', '<u8'), ('length', '<u4')])
+LOCATION_DTYPE = np.dtype([('segment', '<u4'), ('offset', '<u8'), ('length', '<u4')])
+
+def compact_commit(data: dict) -> dict:
+    """Keeps only the /commit fields Blocks reads, in the same response shape."""
+    signed_header = data['result']['signed_header']
+    header = signed_header['header']
+    return {
+        'result': {
+            'signed_header': {
+                'header': {
+                    'height': header['height'],
+                    'time': header['time'],
+                    'proposer_address': header['proposer_address'],
+                    'validators_hash': header['validators_hash'],
+                },
+                'commit': {
+                    'signatures': [
+                        {'validator_address': signature['validator_address']}
+                        for signature in signed_header['commit']['signatures']
+                    ]
+                }
+            }
+        }
+    }
+
+def compact_block(data: dict) -> dict:
+    """Keeps only the /block fields Blocks reads (header, first tx, last commit signers), in the same response shape."""
+    block = data['result']['block']
+    header = block['header']
+    txs = block['data']['txs']
+    return {
+        'result': {
+            'block': {
+                'header': {
+                    'height': header['height'],
+                    'time': header['time'],
+                    'proposer_address': header['proposer_address'],
+                    'validators_hash': header['validators_hash'],
+                },
+                'data': {'txs': txs[:1] if txs else []},
+                'last_commit': {
+                    'signatures': [
+                        {'validator_address': signature['validator_address']}
+                        for signature in block['last_commit']['signatures']
+                    ]
+                }
+            }
+        }
+    }
+
+COMPACTORS = {'commit': compact_commit, 'block': compact_block}
+
+class SegmentStore:
+    """
+    Append-only store of zstd-compressed records keyed by height.
+
+    Records are appended to numbered segment files as [height u64][length u32][payload], and reads go through
+    read-only memory maps of the segment files. Every segment has a sidecar .idx file of packed
+    (height, offset, length) entries, written when the segment is sealed or the store is closed. On open the
+    sidecars are loaded into sorted NumPy arrays looked up with searchsorted, and only the record headers
+    past the end of a sidecar (the tail of a segment written since) are scanned.
+    """
+
+    def __init__(self, path: str, segment_size: int = 256 * 1024 * 1024, compression_level: int = 3, read_only: bool = False):
+        self.path = path
+        self.read_only = read_only
+        self.segment_size = segment_size
+        self.compression_level = compression_level
+        self.maps = {}
+        # Heights put since the last fold into the sorted arrays
+        self.recent = {}
+        self.fold_size = 65536
+        os.makedirs(path, exist_ok=True)
+
+        self.segments = sorted(
+            int(name.split('.')[0]) for name in os.listdir(path) if name.endswith('.seg')
+        )
+        entries = [self.load_index(segment) for segment in self.segments]
+        self.heights, self.locations = self.sort_entries(entries)
+
+        self.active = self.segments[-1] if self.segments else 0
+        self.writer = None
+        if read_only:
+            return
+        if not self.segments:
+            self.segments.append(self.active)
+        self.writer = open(self.segment_path(self.active), 'ab')
+
+    def segment_path(self, segment: int) -> str:
+        return os.path.join(self.path, f"{segment:06d}.seg")
+
+    def index_path(self, segment: int) -> str:
+        return os.path.join(self.path, f"{segment:06d}.idx")
+
+    def load_index(self, segment: int) -> np.ndarray:
+        """Returns the INDEX_DTYPE entries of a segment: its sidecar plus the records appended after it."""
+        size = os.path.getsize(self.segment_path(segment))
+        entries = np.empty(0, dtype=INDEX_DTYPE)
+        if os.path.exists(self.index_path(segment)):
+            entries = np.fromfile(self.index_path(segment), dtype=INDEX_DTYPE)
+        end = int((entries['offset'] + entries['length']).max()) if len(entries) else 0
+        if end > size:
+            log.warning(f"Ignoring index of {self.segment_path(segment)}, it covers more than the segment holds")
+            entries = np.empty(0, dtype=INDEX_DTYPE)
+            end = 0
+
+        tail = self.scan(segment, start=end, size=size)
+        if len(tail):
+            entries = np.concatenate([entries, tail])
+            if not self.read_only and segment != self.segments[-1]:
+                self.write_index(segment, entries)
+        return entries
+
+    def scan(self, segment: int, start: int, size: int) -> np.ndarray:
+        path = self.segment_path(segment)
+        offset = start
+        entries = []
+        with open(path, 'rb') as f:
+            while offset + RECORD_HEADER.size <= size:
+                f.seek(offset)
+                height, length = RECORD_HEADER.unpack(f.read(RECORD_HEADER.size))
+                if offset + RECORD_HEADER.size + length > size:
+                    break
+                entries.append((height, offset + RECORD_HEADER.size, length))
+                offset += RECORD_HEADER.size + length
+
+        if offset != size and not self.read_only:
+            log.warning(f"Dropping torn record at the end of {path} ({size - offset} bytes)")
+            with open(path, 'r+b') as f:
+                f.truncate(offset)
+        return np.array(entries, dtype=INDEX_DTYPE)
+
+    def write_index(self, segment: int, entries: np.ndarray):
+        path = self.index_path(segment)
+        entries.tofile(f"{path}.tmp")
+        os.replace(f"{path}.tmp", path)
+
+    def sort_entries(self, entries: list[np.ndarray]) -> tuple[np.ndarray, np.ndarray]:
+        """Joins per-segment entries into heights sorted for searchsorted and their (segment, offset, length) locations."""
+        locations = np.empty(sum(len(segment_entries) for segment_entries in entries), dtype=LOCATION_DTYPE)
+        heights = np.empty(len(locations), dtype=np.int64)
+        position = 0
+        for segment, segment_entries in zip(self.segments, entries):
+            end = position + len(segment_entries)
+            heights[position:end] = segment_entries['height']
+            locations['segment'][position:end] = segment
+            locations['offset'][position:end] = segment_entries['offset']
+            locations['length'][position:end] = segment_entries['length']
+            position = end
+
+        order = np.argsort(heights, kind='stable')
+        return heights[order], locations[order]
+
+    def locate(self, height: int) -> tuple[int, int, int] | None:
+        location = self.recent.get(height)
+        if location is not None:
+            return location
+        position = self.heights.searchsorted(height)
+        if position < len(self.heights) and self.heights[position] == height:
+            return self.locations[position].tolist()
+
+    def __contains__(self, height: int) -> bool:
+        return self.locate(height) is not None
+
+    def __len__(self) -> int:
+        return len(self.heights) + len(self.recent)
+
+    def fold(self):
+        """Moves the recently put heights into the sorted arrays, so the dict never holds more than fold_size of them."""
+        if not self.recent:
+            return
+        heights = np.fromiter(self.recent, dtype=np.int64, count=len(self.recent))
+        locations = np.array(list(self.recent.values()), dtype=LOCATION_DTYPE)
+        order = np.argsort(heights)
+        positions = np.searchsorted(self.heights, heights[order])
+        self.heights = np.insert(self.heights, positions, heights[order])
+        self.locations = np.insert(self.locations, positions, locations[order])
+        self.recent.clear()
+
+    def segment_entries(self, segment: int) -> np.ndarray:
+        """Every entry of segment as INDEX_DTYPE, in height order."""
+        self.fold()
+        stored = self.locations['segment'] == segment
+        entries = np.empty(int(stored.sum()), dtype=INDEX_DTYPE)
+        entries['height'] = self.heights[stored]
+        entries['offset'] = self.locations['offset'][stored]
+        entries['length'] = self.locations['length'][stored]
+        return entries
+
+    def map(self, segment: int, end: int) -> mmap.mmap:
+        mapped = self.maps.get(segment)
+        if mapped is None or len(mapped) < end:
+            if mapped is not None:
+                mapped.close()
+            with open(self.segment_path(segment), 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.maps[segment] = mapped
+        return mapped
+
+    def get(self, height: int) -> bytes | None:
+        location = self.locate(height)
+        if location is None:
+            return
+        segment, offset, length = location
+        if segment == self.active and self.writer:
+            self.writer.flush()
+        mapped = self.map(segment, offset + length)
+        return zstd.decompress(mapped[offset:offset + length])
+
+    def put(self, height: int, payload: bytes):
+        if self.read_only or height in self:
+            return
+        if self.writer.tell() >= self.segment_size:
+            self.seal()
+
+        compressed = zstd.compress(payload, self.compression_level)
+        offset = self.writer.tell()
+        self.writer.write(RECORD_HEADER.pack(height, len(compressed)))
+        self.writer.write(compressed)
+        self.recent[height] = (self.active, offset + RECORD_HEADER.size, len(compressed))
+        if len(self.recent) >= self.fold_size:
+            self.fold()
+
+    def seal(self):
+        """Closes the active segment with its sidecar index and starts the next one."""
+        self.writer.close()
+        self.write_index(self.active, self.segment_entries(self.active))
+        self.active += 1
+        self.segments.append(self.active)
+        self.writer = open(self.segment_path(self.active), 'ab')
+
+    def close(self):
+        if self.writer:
+            self.writer.close()
+            self.write_index(self.active, self.segment_entries(self.active))
+            self.writer = None
+        for mapped in self.maps.values():
+            mapped.close()
+        self.maps.clear()
+
+class BlockCache:
+    """
+    On-disk cache of compacted /commit and /block responses, one SegmentStore per kind.
+    Any number of read_only caches can share a directory with the one writer. The writer holds an exclusive lock
+    on the directory, because opening a store for writing truncates records it can not read in full yet.
+    """
+
+    def __init__(self, path: str, read_only: bool = False):
+        self.lock = None
+        if not read_only:
+            os.makedirs(path, exist_ok=True)
+            self.lock = open(os.path.join(path, 'writer.lock'), 'w')
+            try:
+                fcntl.flock(self.lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                log.error(f"Block cache at {path} is already opened for writing by another process\nExiting")
+                exit(5)
+
+        self.stores = {kind: SegmentStore(os.path.join(path, kind), read_only=read_only) for kind in COMPACTORS}
+        self.hits = 0
+        self.misses = 0
+        log.info(f"✅ Opened block cache at {path} ({', '.join(f'{kind}: {len(store)}' for kind, store in self.stores.items())} heights)")
+
+    def get(self, kind: str, height: int) -> dict | None:
+        payload = self.stores[kind].get(height)
+        if payload is None:
+            self.misses += 1
+            return
+        self.hits += 1
+        return json.loads(payload)
+
+    def put(self, kind: str, height: int, data: dict):
+        self.stores[kind].put(height, json.dumps(COMPACTORS[kind](data), separators=(',', ':')).encode())
+
+    def close(self):
+        for store in self.stores.values():
+            store.close()
+        if self.lock:
+            self.lock.close()
+        log.info(f"🛑 Block cache closed. Hits: {self.hits}, misses: {self.misses}")
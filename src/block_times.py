@@ -0,0 +1,101 @@
+import numpy as np
+from bisect import bisect_left
+
+from utils.logger import log
+
+from src.aio_calls import AioHttpCalls
+from src.mongodb import MongoDBHandler
+
+def pack_times(times: list[str]) -> bytes:
+    """Packs the header times of one day as uint32 milliseconds since midnight UTC, 4 bytes per height."""
+    return np.fromiter((time_of_day_ms(time) for time in times), dtype=np.uint32, count=len(times)).tobytes()
+
+def time_of_day_ms(time: str) -> int:
+    """'2025-01-01T12:34:56.789123456Z' -> milliseconds since midnight."""
+    milliseconds = time[20:-1][:3].ljust(3, '0') if time[19] == '.' else '0'
+    return ((int(time[11:13]) * 60 + int(time[14:16])) * 60 + int(time[17:19])) * 1000 + int(milliseconds)
+
+def time_at(day: dict, height: int) -> str:
+    """Returns the header time of height, in millisecond precision, from a height_index day."""
+    index = (height - day['start_height']) * 4
+    milliseconds = int.from_bytes(day['times'][index:index + 4], 'little')
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{day['_id']}T{hours:02d}:{minutes:02d}:{seconds:02d}.{milliseconds:03d}Z"
+
+class BlockTimes:
+    """
+    Height <-> date lookups. Heights are answered from the cache, then the height_index collection, then the RPC.
+
+    Block times only grow with height, so every cached height narrows later searches:
+    the first height of a date not in height_index is bisected between the closest cached heights around it.
+    """
+
+    def __init__(self, aio_session: AioHttpCalls, mongo: MongoDBHandler = None):
+        self.aio_session = aio_session
+        self.mongo = mongo
+        self.times = {}
+        self.heights = []
+        self.fetched = 0
+
+    def add(self, height: int, time: str):
+        if height not in self.times:
+            self.times[height] = time
+            self.heights.insert(bisect_left(self.heights, height), height)
+
+    async def get_time(self, height: int) -> str | None:
+        if height not in self.times and self.mongo:
+            day = await self.mongo.get_height_index(height=height)
+            if day:
+                self.add(height=height, time=time_at(day=day, height=height))
+
+        if height not in self.times:
+            block = await self.aio_session.fetch_with_retry(
+                description=f"block {height} time",
+                request=lambda: self.aio_session.get_block(height=height)
+            )
+            if not block:
+                return
+            self.fetched += 1
+            self.add(height=height, time=block['result']['signed_header']['header']['time'])
+        return self.times[height]
+
+    async def get_date(self, height: int) -> str | None:
+        time = await self.get_time(height=height)
+        if time:
+            return time.split('T')[0]
+
+    async def first_height_of_date(self, date: str, low: int, high: int) -> int | None:
+        """
+        Returns the lowest height in [low, high] whose UTC date is date or later, high when none is.
+        Takes O(log(high - low)) block requests on a cold cache.
+        """
+        if self.mongo:
+            day = await self.mongo.get_height_index(date=date)
+            if day and low <= day['start_height'] <= high:
+                return day['start_height']
+
+        fetched = self.fetched
+        position = bisect_left(self.heights, low)
+        while position < len(self.heights) and self.heights[position] <= high:
+            height = self.heights[position]
+            if self.times[height].split('T')[0] < date:
+                low = height + 1
+            else:
+                high = height
+                break
+            position += 1
+
+        while low < high:
+            middle = (low + high) // 2
+            middle_date = await self.get_date(height=middle)
+            if not middle_date:
+                return
+            if middle_date < date:
+                low = middle + 1
+            else:
+                high = middle
+
+        log.debug(f"First height of {date}: {low} ({self.fetched - fetched} block requests)")
+        return low
@@ -1,15 +1,24 @@
 import asyncio
 import os
+import time
+from collections import OrderedDict, deque
+from contextlib import aclosing
+from datetime import date as Date
+from itertools import groupby
 from sys import exit
 
 from utils.config import Config
 from utils.logger import log
 
+from src.aggregator import DayAccumulator
 from src.aio_calls import AioHttpCalls
+from src.block_times import BlockTimes, pack_times, time_at
+from src.concurrency import AIMDController
 from src.decoder import KeysUtils
 from src.extension import ExtensionParser
 from src.mongodb import MongoDBHandler
-from multiprocessing import Pool
+from src.write_behind import WriteBehind
+from concurrent.futures import ProcessPoolExecutor
 
 class Blocks:
     def __init__(
@@ -39,61 +48,91 @@ class Blocks:
 
         self.app_blocks_batch_size = None
         self.app_sleep_between_blocks_batch = None
-
-        self.validators = {}
+        self.concurrency = None
+
+        self.block_times = BlockTimes(aio_session=aio_session, mongo=mongo)
+        self.validators = DayAccumulator()
+        self.day_bitmaps = []
+        self.day_times = []
+        self.checkpoint_interval = config.checkpoint_interval
+        self.checkpoint_height = None
+        self.writer = WriteBehind(mongo=mongo, chain_id=config.chain_id)
+        self.persist_valsets = config.persist_valsets or config.store_block_bitmaps
+        self.valsets = OrderedDict()
+        self.valsets_limit = 32
+        self.commits = {}
+        self.block_details = {}
+
+        self.decode_executor = None
+        self.decode_workers = config.decode_workers or max(1, os.cpu_count() - 1)
+        self.decode_chunks_per_worker = config.decode_chunks_per_worker
+        self.decode_total_time = 0.0
+        self.decode_total_extensions = 0
 
     async def check_rpc_status(self):
-        """Checks the RPC connection to ensure it is online."""
-        status = await self.aio_session.get_rpc_status()
-        if not status:
-            log.error(f"Failed to connect to {self.config.rpc}. Ensure the RPC URL format is correct and the node is online.")
-            exit(5)
-
-        catching_up = status['sync_info']['catching_up']
-        latest_block_height = status['sync_info']['latest_block_height']
-        latest_block_time = status['sync_info']['latest_block_time']
-        chain_id = status['node_info']['network']
-        tx_index = status['node_info']['other']['tx_index']
-        self.rpc_latest_height = int(latest_block_height)
+        """
+        Checks every RPC endpoint to ensure it is online and serves the configured chain.
+        The lowest latest height of all endpoints is the upper bound, so every endpoint can serve it.
+        """
+        statuses = await self.aio_session.get_rpc_statuses()
+        for url, status in statuses:
+            if not status:
+                log.error(f"Failed to connect to {url}. Ensure the RPC URL format is correct and the node is online.")
+                exit(5)
 
         rpc_lowest_height = await self.aio_session.get_rpc_lowest_height()
         if not rpc_lowest_height:
-            log.error(f"Failed to fetch lowest_height on {self.config.rpc}. Ensure the RPC URL format is correct and the node is online.")
+            log.error(f"Failed to fetch lowest_height on {', '.join(url for url, _ in statuses)}. Ensure the RPC URL format is correct and the node is online.")
             exit(5)
         self.rpc_lowest_height = int(rpc_lowest_height)
-        
-        if rpc_lowest_height != 1:
-            log.warning(f"Provided RPC node is pruned. Check {self.config.rpc}/block?height=1. Ignoring.")
 
-        log.info(f"""
+        for endpoint, (url, status) in zip(self.aio_session.rpc_endpoints, statuses):
+            catching_up = status['sync_info']['catching_up']
+            latest_block_height = status['sync_info']['latest_block_height']
+            latest_block_time = status['sync_info']['latest_block_time']
+            chain_id = status['node_info']['network']
+            tx_index = status['node_info']['other']['tx_index']
+
+            log.info(f"""
 ---------------------RPC STATUS----------------------
-URL: {self.config.rpc}
+URL: {url}
 CHAIN_ID: {chain_id}
 CATCHING_UP: {catching_up}
 LATEST BLOCK: {latest_block_height} | {latest_block_time}
 INDEXER: {tx_index.upper()}
-LOWEST BLOCK: {rpc_lowest_height}
+LOWEST BLOCK: {endpoint.lowest_height}
 ------------------------------------------------------
 """)
-        if chain_id != self.config.chain_id:
-            log.error(f"Chain id missmatch. Expected {self.config.chain_id}, got {chain_id}")
-            exit(5)
+            if chain_id != self.config.chain_id:
+                log.error(f"Chain id missmatch on {url}. Expected {self.config.chain_id}, got {chain_id}")
+                exit(5)
+
+            if endpoint.lowest_height != 1:
+                log.warning(f"Provided RPC node is pruned. Check {url}/block?height=1. Ignoring.")
+
+            if catching_up:
+                log.warning(f"Provided RPC node is catching up. Check {url}/status. Ignoring.")
 
-        if catching_up:
-            log.warning(f"Provided RPC node is catching up. Check {self.rpc}/status. Ignoring.")
+            if tx_index != 'on':
+                log.warning(f"Provided RPC node {url} is not indexing events. Ignoring.")
 
-        if tx_index != 'on':
-            log.warning(f"Provided RPC node is not indexing events. Ignoring.")
+        self.rpc_latest_height = min(int(status['sync_info']['latest_block_height']) for _, status in statuses)
 
     async def set_intial_all_vars(self):
         if self.config.end_height == 'auto':
             self.app_end_height = self.rpc_latest_height
-            app_end_height_data = await self.aio_session.get_block(height=self.app_end_height)
-            if app_end_height_data: 
-                self.app_end_date = app_end_height_data['result']['signed_header']['header']['time'].split('T')[0]
-            else:
+            self.app_end_date = await self.block_times.get_date(height=self.app_end_height)
+            if not self.app_end_date:
                 log.error(f"Failed to query app_end_height block: {self.app_end_height}")
                 exit(5)
+        elif isinstance(self.config.end_height, Date):
+            # A UTC date: stop at its first block, after the day before it is stored
+            self.app_end_date = self.config.end_height.isoformat()
+            first_height = await self.block_times.first_height_of_date(date=self.app_end_date, low=self.rpc_lowest_height, high=self.rpc_latest_height)
+            if not first_height or await self.block_times.get_date(height=first_height) < self.app_end_date:
+                log.error(f"Failed to find the first block of end date {self.app_end_date} between {self.rpc_lowest_height} and {self.rpc_latest_height}")
+                exit(5)
+            self.app_end_height = first_height + 1
         else:
             self.app_end_height = self.config.end_height
 
@@ -111,16 +150,28 @@ LOWEST BLOCK: {rpc_lowest_height}
 
         self.day_start_height = self.app_start_height
 
-        app_start_block_data = await self.aio_session.get_block(height=self.app_start_height)
-        if app_start_block_data:
-            self.app_start_date = app_start_block_data['result']['signed_header']['header']['time'].split('T')[0]
+        checkpoint = None
+        if self.config.start_height == 'auto' and self.checkpoint_interval:
+            checkpoint = await self.mongo.get_checkpoint()
+            if checkpoint and (checkpoint['chain_id'] != self.config.chain_id or checkpoint['day_start_height'] != self.day_start_height):
+                log.info(f"Ignoring checkpoint at {checkpoint['height']}: it does not continue from height {self.day_start_height}")
+                checkpoint = None
+            if checkpoint:
+                self.app_start_height = checkpoint['height'] + 1
+
+        self.app_start_date = await self.block_times.get_date(height=self.app_start_height)
+        if self.app_start_date:
             self.app_current_date = self.app_start_date
         else:
             log.error(f"Failed to query app_start_height block: {self.app_start_height}")
             exit(5)
+
+        if checkpoint:
+            await self.restore_checkpoint(checkpoint=checkpoint)
         
         self.app_blocks_batch_size = self.config.blocks_batch_size
         self.app_sleep_between_blocks_batch = self.config.sleep_between_blocks_batch
+        self.set_concurrency()
 
         log.info(f"""
 ---------------------APP SETTINGS----------------------
@@ -129,35 +180,52 @@ START DATE: {self.app_start_date}
 END HEIGHT: {self.app_end_height}
 END DATE: {self.app_end_date}
 BLOCKS BATCH SIZE: {self.app_blocks_batch_size}
+ADAPTIVE CONCURRENCY: {f"{self.config.concurrency.min_in_flight} - {self.config.concurrency.max_in_flight}" if self.concurrency else "OFF"}
 ------------------------------------------------------
 """)
+
+
+    def set_concurrency(self):
+        if self.config.concurrency.enabled:
+            self.concurrency = AIMDController(
+                initial=self.app_blocks_batch_size,
+                minimum=self.config.concurrency.min_in_flight,
+                maximum=self.config.concurrency.max_in_flight,
+                decrease_factor=self.config.concurrency.decrease_factor,
+                latency_tolerance=self.config.concurrency.latency_tolerance
+            )
+            self.aio_session.request_listeners.append(self.concurrency.on_request)
         
     async def start(self):
         await self.check_rpc_status()
         await self.set_intial_all_vars()
-        await self.parse_blocks_batches()
+
+        if self.config.multiprocessing:
+            self.decode_executor = ProcessPoolExecutor(max_workers=self.decode_workers)
+            log.info(f"✅ Started extension decode pool with {self.decode_workers} workers")
+        try:
+            await self.parse_blocks_batches()
+        finally:
+            self.shutdown_decode_executor()
+            await self.writer.close()
+
+    def shutdown_decode_executor(self):
+        if self.decode_executor:
+            self.decode_executor.shutdown(wait=True, cancel_futures=True)
+            self.decode_executor = None
+            log.info("🛑 Extension decode pool stopped.")
+
+        if self.decode_total_extensions:
+            log.info(f"Decoded {self.decode_total_extensions} extensions in {self.decode_total_time:.2f}s ({self.decode_total_time / self.decode_total_extensions * 1000:.2f}ms per extension)")
+
+    async def get_commit(self, height: int):
+        return await self.aio_session.fetch_with_retry(
+            description=f"block {height}",
+            request=lambda: self.aio_session.get_block(height=height)
+        )
 
     async def get_block_signatures(self, height: int):
-        
-        async def fetch_with_retry(height, retries=3):
-            for attempt in range(retries):
-                try:
-                    block = await self.aio_session.get_block(height=height)
-                    if block and 'result' in block:
-                        if attempt > 0:
-                            log.info(f"Successfully fetched block {height} after {attempt + 1} attempt(s).")
-                        return block
-                    else:
-                        raise ValueError("Invalid response")
-                except Exception as e:
-                    if attempt < retries - 1:
-                        log.warning(f"Retrying block {height} request (attempt {attempt + 1}) due to: {e}")
-                        await asyncio.sleep(3)
-                    else:
-                        log.error(f"Failed to fetch block {height} after {retries} attempt(s).")
-                        return
-        
-        block = await fetch_with_retry(height=height)
+        block = await self.get_shared_commit(height=height)
         if block:
 
             signed_header = block['result']['signed_header']
@@ -166,42 +234,77 @@ BLOCKS BATCH SIZE: {self.app_blocks_batch_size}
                 for signature in signed_header['commit']['signatures']
             ]
             proposer = signed_header['header']['proposer_address']
-            block_date = signed_header['header']['time'].split('T')[0]
+            block_time = signed_header['header']['time']
+            validators_hash = signed_header['header']['validators_hash']
             return {
                 "height": height,
                 "signatures": signatures,
                 "proposer": proposer,
-                "date": block_date
+                "time": block_time,
+                "date": block_time.split('T')[0],
+                "validators_hash": validators_hash
             }
 
+    async def get_block_details(self, height: int):
+        return await self.aio_session.fetch_with_retry(
+            description=f"block {height} details",
+            request=lambda: self.aio_session.get_block_details(height=height)
+        )
+
     async def get_block_extension(self, height: int):
-        
-        async def fetch_with_retry(height, retries=3):
-            for attempt in range(retries):
-                try:
-                    block = await self.aio_session.get_block_details(height=height)
-                    if block and 'result' in block:
-                        if attempt > 0:
-                            log.info(f"Successfully fetched block {height} after {attempt + 1} attempt(s).")
-
-                        return block
-                    else:
-                        raise ValueError("Invalid response")
-                except Exception as e:
-                    if attempt < retries - 1:
-                        log.warning(f"Retrying block {height} request (attempt {attempt + 1}) due to: {e}")
-                        await asyncio.sleep(3)
-                    else:
-                        log.error(f"Failed to fetch block {height} after {retries} attempt(s).")
-                        return
-        
-        block = await fetch_with_retry(height=height)
+        block = await self.get_shared_block_details(height=height)
         if block:
-            block_txs = block['result']['block']['data']['txs']
-            if block_txs:
-                return block_txs[0]
-            else:
-                return ""
+            return extract_extension_tx(block)
+
+    async def get_shared_commit(self, height: int):
+        if height not in self.commits:
+            self.commits[height] = asyncio.create_task(self.get_commit(height=height))
+        return await self.commits[height]
+
+    async def get_shared_block_details(self, height: int):
+        """Every /block response is used twice in blocks fetch mode, so concurrent heights share one request."""
+        if height not in self.block_details:
+            self.block_details[height] = asyncio.create_task(self.get_block_details(height=height))
+        return await self.block_details[height]
+
+    def forget_block_details(self, height: int):
+        for responses in (self.commits, self.block_details):
+            for cached_height in [h for h in responses if h <= height]:
+                del responses[cached_height]
+
+    def prefetch_heights(self, heights: list[int]):
+        """
+        Requests /commit and /block for new heights in JSON-RPC batches of rpc_batch_size.
+        The per-height tasks are put where get_shared_commit/get_shared_block_details look first
+        and fall back to a single request when a height is missing from the batch response.
+        """
+        if not self.config.rpc_batch_size or not heights:
+            return
+
+        if self.config.blocks_fetch_mode == 'block':
+            heights = heights + [heights[-1] + 1]
+            sources = [(self.block_details, self.aio_session.get_blocks_batch, self.get_block_details)]
+        else:
+            sources = [
+                (self.commits, self.aio_session.get_commits_batch, self.get_commit),
+                (self.block_details, self.aio_session.get_blocks_batch, self.get_block_details),
+            ]
+
+        for responses, fetch_batch, fetch_single in sources:
+            for i in range(0, len(heights), self.config.rpc_batch_size):
+                group = [height for height in heights[i:i + self.config.rpc_batch_size] if height not in responses]
+                if not group:
+                    continue
+                batch = asyncio.create_task(fetch_batch(heights=group))
+                for height in group:
+                    responses[height] = asyncio.create_task(self.pick_from_batch(batch=batch, height=height, fetch_single=fetch_single))
+
+    async def pick_from_batch(self, batch: asyncio.Task, height: int, fetch_single):
+        responses = await batch
+        response = responses.get(height) if responses else None
+        if response and 'result' in response:
+            return response
+        return await fetch_single(height=height)
 
     async def get_all_valset(self, height: int):
         merged_valsets = []
@@ -209,26 +312,11 @@ BLOCKS BATCH SIZE: {self.app_blocks_batch_size}
         total = 0
         count = 0
 
-        async def fetch_with_retry(height, page, retries=3):
-            for attempt in range(retries):
-                try:
-                    sublist = await self.aio_session.get_valset_at_block(height=height, page=page)
-                    if sublist and 'result' in sublist:
-                        if attempt > 0:
-                            log.info(f"Successfully fetched valset at height {height} & page {page} after {attempt + 1} attempt(s).")
-                        return sublist
-                    else:
-                        raise ValueError("Invalid response")
-                except Exception as e:
-                    if attempt < retries - 1:
-                        log.warning(f"Retrying valset request at height {height} / page {page} (attempt {attempt + 1}) due to: {e}")
-                        await asyncio.sleep(3)
-                    else:
-                        log.error(f"Failed to fetch valset page {page} after {retries} attempt(s).")
-                        return
-
         while count < total or total == 0:
-            sublist = await fetch_with_retry(height, page)
+            sublist = await self.aio_session.fetch_with_retry(
+                description=f"valset at height {height} / page {page}",
+                request=lambda: self.aio_session.get_valset_at_block(height=height, page=page)
+            )
             
             if not sublist:
                 return
@@ -241,104 +329,312 @@ BLOCKS BATCH SIZE: {self.app_blocks_batch_size}
 
         return merged_valsets
     
-    async def parse_blocks_batches(self):
-
-        for height in range(self.app_start_height, self.app_end_height, self.app_blocks_batch_size):
-            latest_height = min(height + self.app_blocks_batch_size, self.app_end_height)
-
-
-            blocks_tasks = []
-            valset_tasks = []
-            extension_tasks = []
-
-            for current_height in range(height, latest_height):
-                blocks_tasks.append(self.get_block_signatures(height=current_height))
-                valset_tasks.append(self.get_all_valset(height=current_height))
-                extension_tasks.append(self.get_block_extension(height=current_height))
-
-            blocks, valsets, extensions = await asyncio.gather(
-                asyncio.gather(*blocks_tasks),
-                asyncio.gather(*valset_tasks),
-                asyncio.gather(*extension_tasks),
-            )
-
-            if self.config.multiprocessing:
-                with Pool(os.cpu_count() - 1) as pool:
-                    parsed_extensions = pool.map(process_extension, extensions)
-            else:
-                parsed_extensions = [process_extension(ext) for ext in extensions]
+    async def get_cached_valset(self, height: int, validators_hash: str):
+        """
+        Returns the ordered valset for validators_hash, fetching it from the RPC only on the first miss.
+        Heights in flight with the same unseen hash share a single fetch task.
+        Only the most recently used hashes are kept, older ones are loaded again on demand.
+        """
+        task = self.valsets.get(validators_hash)
+        if task is None:
+            task = asyncio.create_task(self.load_valset(height=height, validators_hash=validators_hash))
+            self.valsets[validators_hash] = task
+            while len(self.valsets) > self.valsets_limit:
+                self.valsets.popitem(last=False)
+        else:
+            self.valsets.move_to_end(validators_hash)
+
+        valset = await task
+        if not valset and self.valsets.get(validators_hash) is task:
+            self.valsets.pop(validators_hash)
+        return valset
+
+    async def load_valset(self, height: int, validators_hash: str):
+        if self.persist_valsets:
+            valset = await self.mongo.get_valset(validators_hash=validators_hash)
+            if valset:
+                return valset
+
+        valset = await self.get_all_valset(height=height)
+        if valset:
+            log.debug(f"Valset {validators_hash} changed at block {height} | Valset {len(valset)}")
+            if self.persist_valsets:
+                await self.mongo.insert_valset(validators_hash=validators_hash, height=height, validators=valset)
+        return valset
+
+    async def fetch_height(self, height: int):
+        if self.config.blocks_fetch_mode == 'block':
+            return await self.fetch_height_from_blocks(height=height)
+
+        block, extension = await asyncio.gather(
+            self.get_block_signatures(height=height),
+            self.get_block_extension(height=height),
+        )
+        valset = None
+        if block:
+            valset = await self.get_cached_valset(height=height, validators_hash=block['validators_hash'])
+        return block, valset, extension
+
+    async def fetch_height_from_blocks(self, height: int):
+        """
+        Builds the same block summary as fetch_height from /block responses only:
+        header and vote extension tx come from block height, signatures from last_commit of block height + 1.
+        """
+        current, following = await asyncio.gather(
+            self.get_shared_block_details(height=height),
+            self.get_shared_block_details(height=height + 1),
+        )
+        if not current or not following:
+            return None, None, None
+
+        header = current['result']['block']['header']
+        block = {
+            "height": height,
+            "signatures": [
+                signature['validator_address']
+                for signature in following['result']['block']['last_commit']['signatures']
+            ],
+            "proposer": header['proposer_address'],
+            "time": header['time'],
+            "date": header['time'].split('T')[0],
+            "validators_hash": header['validators_hash']
+        }
+        valset = await self.get_cached_valset(height=height, validators_hash=block['validators_hash'])
+        return block, valset, extract_extension_tx(current)
+
+    def window_size(self) -> int:
+        if self.concurrency:
+            return self.concurrency.limit
+        return self.app_blocks_batch_size
+
+    async def stream_blocks(self):
+        """
+        Keeps up to window_size() heights in flight and yields completed heights in order.
+        Every yielded chunk holds the contiguous run of finished heights at the head of the window,
+        so new requests are scheduled as soon as old ones are handed over instead of waiting for a whole batch.
+        """
+        pending = deque()
+        next_height = self.app_start_height
+
+        try:
+            while pending or next_height < self.app_end_height:
+                free_slots = max(0, self.window_size() - len(pending))
+                remaining = self.app_end_height - next_height
+                # With JSON-RPC batching, wait until a full batch fits into the window
+                if not pending or free_slots >= min(self.config.rpc_batch_size, remaining):
+                    new_heights = list(range(next_height, next_height + min(free_slots, remaining)))
+                    self.prefetch_heights(heights=new_heights)
+                    for new_height in new_heights:
+                        pending.append((new_height, asyncio.create_task(self.fetch_height(height=new_height))))
+                    next_height += len(new_heights)
+
+                chunk = []
+                height, task = pending.popleft()
+                chunk.append((height, *await task))
+
+                while pending and pending[0][1].done() and len(chunk) < self.app_blocks_batch_size:
+                    height, task = pending.popleft()
+                    chunk.append((height, *task.result()))
+
+                self.forget_block_details(height=height)
+                yield chunk
+        finally:
+            for _, task in pending:
+                task.cancel()
+
+    async def decode_extensions(self, extensions: list[str]) -> list[dict]:
+        """
+        Decodes vote extensions on the long-lived process pool, splitting them into chunks
+        so each worker gets a few submissions per batch instead of one per extension.
+        """
+        started = time.perf_counter()
+
+        if self.decode_executor:
+            loop = asyncio.get_running_loop()
+            chunk_size = max(1, -(-len(extensions) // (self.decode_workers * self.decode_chunks_per_worker)))
+            chunks = await asyncio.gather(*(
+                loop.run_in_executor(self.decode_executor, process_extensions, extensions[i:i + chunk_size])
+                for i in range(0, len(extensions), chunk_size)
+            ))
+            parsed_extensions = [parsed for chunk in chunks for parsed in chunk]
+        else:
+            parsed_extensions = await asyncio.to_thread(process_extensions, extensions)
 
-            for block, valset, parsed_extension in zip(blocks, valsets, parsed_extensions):
-                if not block:
-                    log.error(f"Failed to query {current_height-1} block\nMake sure block range {height} --> {latest_height} is available on the RPC\nOr try to reduce blocks_batch_size size in config\nExiting")
-                    exit(5)
+        elapsed = time.perf_counter() - started
+        self.decode_total_time += elapsed
+        self.decode_total_extensions += len(extensions)
+        log.debug(f"Decoded {len(extensions)} extensions in {elapsed * 1000:.1f}ms")
+        return parsed_extensions
 
+    async def parse_blocks_batches(self):
+        async with aclosing(self.stream_blocks()) as chunks:
+            async for chunk in chunks:
+                for height, block, valset, extension in chunk:
+                    if not block:
+                        log.error(f"Failed to query {height} block\nMake sure block {height} is available on the RPC\nOr try to reduce blocks_batch_size size in config\nExiting")
+                        exit(5)
+
+                    if not valset:
+                        log.error(f"Failed to query valset at block {height}\nMake sure block {height} is available on the RPC\nOr try to reduce blocks_batch_size size in config\nExiting")
+                        exit(5)
+
+                    # A block without txs has an empty extension, None means its /block response never arrived
+                    if extension is None:
+                        log.error(f"Failed to query block extension at block {height}\nMake sure block {height} is available on the RPC\nOr try to reduce blocks_batch_size size in config\nExiting")
+                        exit(5)
+
+                parsed_extensions = await self.decode_extensions([ext for *_, ext in chunk])
+
+                blocks = []
+                bitmaps = []
+                for (height, block, valset, _), parsed_extension in zip(chunk, parsed_extensions):
+                    log.debug(f"Block {block['height']} | Date {block['date']} | Valset {len(valset)} | Sigantures {len(block['signatures'])}")
+
+                    block_bitmaps = self.validators.block_bitmaps(
+                        height=height,
+                        valset=valset,
+                        validators_hash=block['validators_hash'],
+                        signatures=block['signatures'],
+                        proposer=block['proposer'],
+                        oracle_votes=parsed_extension
+                    )
+                    for hex in block_bitmaps['missing_oracle']:
+                        log.warning(f"Missing active validator in vote extension. Ignoring... ({hex}): {parsed_extension}")
+
+                    blocks.append(block)
+                    bitmaps.append(block_bitmaps)
+
+                if not await self.aggregate_blocks(blocks=blocks, bitmaps=bitmaps):
+                    return
+
+                if self.checkpoint_interval and self.app_current_height - (self.checkpoint_height or self.day_start_height) >= self.checkpoint_interval:
+                    await self.save_checkpoint()
+
+                if self.app_sleep_between_blocks_batch and not self.concurrency:
+                    await asyncio.sleep(self.app_sleep_between_blocks_batch)
+
+    async def aggregate_blocks(self, blocks: list[dict], bitmaps: list[dict]) -> bool:
+        """
+        Adds consecutive blocks to the day stats, one vectorised add per run of blocks with the same date.
+        Returns False once the end date is reached.
+        """
+        for date, run in groupby(zip(blocks, bitmaps), key=lambda item: item[0]['date']):
+            run = list(run)
+            if not await self.rollover_day(date=date):
+                return False
+
+            self.validators.add_blocks([block_bitmaps for _, block_bitmaps in run])
+            if self.config.store_block_bitmaps:
+                self.day_bitmaps.extend(block_bitmaps for _, block_bitmaps in run)
+            self.day_times.extend(block['time'] for block, _ in run)
+            self.app_current_date = date
+            self.app_current_height = run[-1][0]['height']
+        return True
+
+    async def rollover_day(self, date: str) -> bool:
+        """Stores the finished day when date moves past it. Returns False once the end date is reached."""
+        if self.app_current_date != date:
+            log.info(f"Date changed: {self.app_current_date} -> {date}. Inserting stats into DB | Heights in flight: {self.window_size()}")
+            await self.store_day()
+            self.validators.clear()
+            self.day_start_height = self.app_current_height + 1
+
+            if date == self.app_end_date:
+                log.info(f"End date reached: {date}. Exiting")
+                return False
+
+        return True
+
+    async def store_day(self):
+        """Hands the finished app_current_date, its block times and packed block bitmaps, when enabled, to write_day."""
+        runs = None
+        if self.config.store_block_bitmaps:
+            runs = self.validators.pack_runs(self.day_bitmaps)
+            self.day_bitmaps.clear()
+
+        times = self.day_times
+        self.day_times = []
+
+        await self.write_day(
+            date=self.app_current_date,
+            date_start_height=self.day_start_height,
+            date_end_height=self.app_current_height,
+            stats=self.validators.to_stats(),
+            runs=runs,
+            times=times
+        )
+
+    async def write_day(
+        self,
+        date: str,
+        date_start_height: int,
+        date_end_height: int,
+        stats: dict,
+        runs: list[dict] = None,
+        times: list[str] = None
+    ):
+        """Queues the stats of a day, its block bitmaps and times when given, and the lock update past its last height."""
+        await self.writer.put('day', {
+            'date': date,
+            'date_start_height': date_start_height,
+            'date_end_height': date_end_height,
+            'stats': stats,
+            'runs': runs,
+            'times': pack_times(times) if times else None,
+        })
+
+    async def save_checkpoint(self):
+        """
+        Stores the unfinished day in one document: the partial counters, block times and bitmaps
+        up to app_current_height. A restart resumes after it instead of redoing the day from day_start_height.
+        """
+        runs = None
+        if self.config.store_block_bitmaps:
+            runs = self.validators.pack_runs(self.day_bitmaps)
+
+        await self.writer.put('checkpoint', dict(
+            height=self.app_current_height,
+            date=self.app_current_date,
+            day_start_height=self.day_start_height,
+            chain_id=self.config.chain_id,
+            stats=self.validators.to_stats(),
+            times=pack_times(self.day_times),
+            runs=runs
+        ))
+        self.checkpoint_height = self.app_current_height
+
+    async def restore_checkpoint(self, checkpoint: dict):
+        self.validators.load_stats(checkpoint['stats'])
+        self.day_start_height = checkpoint['day_start_height']
+        self.app_current_date = checkpoint['date']
+        self.app_current_height = self.checkpoint_height = checkpoint['height']
+
+        day = {'_id': checkpoint['date'], 'start_height': checkpoint['day_start_height'], 'times': checkpoint['times']}
+        self.day_times = [time_at(day=day, height=height) for height in range(self.day_start_height, self.app_current_height + 1)]
+
+        if self.config.store_block_bitmaps:
+            for run in checkpoint['runs'] or []:
+                valset = await self.get_cached_valset(height=run['start_height'], validators_hash=run['validators_hash'])
                 if not valset:
-                    log.error(f"Failed to query valset at block {current_height-1}\nMake sure block range {height} --> {latest_height} is available on the RPC\nOr try to reduce blocks_batch_size size in config\nExiting")
+                    log.error(f"Failed to load valset {run['validators_hash']} to restore the checkpoint bitmaps")
                     exit(5)
+                self.day_bitmaps.extend(self.validators.unpack_run(run=run, valset=valset))
 
-                if parsed_extension is None:
-                    log.error(f"Failed to parse block extension at block {current_height-1}\nMake sure block range {height} --> {latest_height} is available on the RPC\nOr try to reduce blocks_batch_size size in config\nExiting")
-                    exit(5)
+        log.info(f"Resuming {self.app_current_date} from checkpoint at height {self.app_current_height} (day started at {self.day_start_height})")
 
-                log.debug(f"Block {block['height']} | Date {block['date']} | Valset {len(valset)} | Sigantures {len(block['signatures'])}")
-
-                if self.app_current_date != block['date']:
-                    log.info(f"Date changed: {self.app_current_date} -> {block['date']}. Inserting stats into DB")
-
-                    await self.mongo.insert_daily_validator_stats(
-                        date=self.app_current_date,
-                        date_start_height=self.day_start_height,
-                        date_end_height=self.app_current_height,
-                        stats=self.validators
-                    )
-
-                    await self.mongo.update_latest_processed_block(
-                        height=self.app_current_height,
-                        time=self.app_current_date,
-                        chain_id=self.config.chain_id
-                    )
-                    self.validators.clear()
-                    self.day_start_height = self.app_current_height + 1
-
-                    if block['date'] == self.app_end_date:
-                        log.info(f"End date reached: {block['date']}. Exiting")
-                        return
-
-                for hex in valset:
-                    self.validators.setdefault(hex, {
-                        'proposed_blocks': 0,
-                        'signed_blocks': 0,
-                        'missed_blocks': 0,
-                        'signed_oracle': 0,
-                        'missed_oracle': 0,
-                    })
-
-                    if hex == block['proposer']:
-                        self.validators[hex]['proposed_blocks'] += 1
-
-                    if hex in block['signatures']:
-                        self.validators[hex]['signed_blocks'] += 1
-
-                    else:
-                        self.validators[hex]['missed_blocks'] += 1
-                    
-                    if parsed_extension.get(hex) is True:
-                        self.validators[hex]['signed_oracle'] += 1
-                    elif parsed_extension.get(hex) is False:
-                        self.validators[hex]['missed_oracle'] += 1
-                    else:
-                        log.warning(f"Missing active validator in vote extension. Ignoring... {self.validators[hex]} ({hex}): {parsed_extension}")
-
-                self.app_current_date = block['date']
-                self.app_current_height = block['height']
-
-            if self.app_sleep_between_blocks_batch:
-                await asyncio.sleep(self.app_sleep_between_blocks_batch)
+def extract_extension_tx(block: dict) -> str:
+    block_txs = block['result']['block']['data']['txs']
+    if block_txs:
+        return block_txs[0]
+    else:
+        return ""
 
 def process_extension(tx: str):
     extension_validators = ExtensionParser.parse_votes_extension(tx=tx)
     return {
         KeysUtils.consensus_pubkey_bytes_to_hex(v['validator_address']): bool(v['pairs'])
         for v in extension_validators
-    }
\ No newline at end of file
+    }
+
+def process_extensions(txs: list[str]) -> list[dict]:
+    return [process_extension(tx) for tx in txs]
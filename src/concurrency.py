@@ -0,0 +1,67 @@
+import time
+from utils.logger import log
+
+class AIMDController:
+    """
+    Additive increase / multiplicative decrease limit for heights kept in flight.
+
+    The limit grows by one after every `limit` healthy requests and is cut by `decrease_factor`
+    on timeouts, connection errors, 429 or 5xx responses. Requests slower than
+    `latency_tolerance` x the fastest latency seen so far stop the growth without cutting the limit.
+    """
+
+    def __init__(
+        self,
+        initial: int,
+        minimum: int,
+        maximum: int,
+        decrease_factor: float = 0.5,
+        latency_tolerance: float = 3.0,
+        latency_decay: float = 0.1
+    ):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = min(max(initial, minimum), maximum)
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.latency_decay = latency_decay
+
+        self.latency = None
+        self.base_latency = None
+        self.healthy_streak = 0
+        self.last_decrease = 0.0
+
+    def is_overload(self, status: int | None) -> bool:
+        return status is None or status == 429 or status >= 500
+
+    def on_request(self, elapsed: float, status: int | None):
+        if self.is_overload(status):
+            self.decrease(reason="timeout" if status is None else f"status {status}")
+            return
+
+        self.latency = elapsed if self.latency is None else self.latency + self.latency_decay * (elapsed - self.latency)
+        self.base_latency = elapsed if self.base_latency is None else min(self.base_latency, elapsed)
+
+        if self.latency > self.base_latency * self.latency_tolerance:
+            self.healthy_streak = 0
+            return
+
+        self.healthy_streak += 1
+        if self.healthy_streak >= self.limit and self.limit < self.maximum:
+            self.healthy_streak = 0
+            self.limit += 1
+            log.debug(f"Concurrency increased to {self.limit} (latency {self.latency * 1000:.0f}ms)")
+
+    def decrease(self, reason: str):
+        now = time.monotonic()
+        # Failures of requests sent before the last cut belong to the same overload episode
+        cooldown = self.latency if self.latency is not None else 1.0
+        if now - self.last_decrease < cooldown:
+            return
+
+        previous = self.limit
+        self.limit = max(self.minimum, int(self.limit * self.decrease_factor))
+        self.healthy_streak = 0
+        self.last_decrease = now
+        if self.limit != previous:
+            log.warning(f"Concurrency decreased {previous} -> {self.limit} ({reason})")
@@ -0,0 +1,109 @@
+import asyncio
+import random
+import time
+from utils.logger import log
+
+class Endpoint:
+    """One RPC or API url with its recent latency, error rate, circuit state and available height window."""
+
+    def __init__(self, url: str, latency_decay: float = 0.2, circuit_failures: int = 5, circuit_cooldown: float = 30):
+        self.url = url.rstrip('/')
+        self.latency_decay = latency_decay
+        self.circuit_failures = circuit_failures
+        self.circuit_cooldown = circuit_cooldown
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.probing = False
+        self.latency = 0.0
+        self.error_rate = 0.0
+        self.in_flight = 0
+        self.requests = 0
+        self.lowest_height = None
+        self.batch_supported = True
+        self.max_batch_size = None
+
+    def has_height(self, height: int) -> bool:
+        return self.lowest_height is None or height >= self.lowest_height
+
+    def is_open(self) -> bool:
+        """An open circuit takes the endpoint out of rotation until the cooldown passes."""
+        return self.open_until > time.monotonic()
+
+    async def wait_closed(self):
+        """
+        Holds a request to this endpoint while its circuit is open, so load is shed even when it is the only endpoint.
+        After the cooldown one request probes the endpoint and the others wait for it:
+        a success closes the circuit, a failure opens it for another cooldown.
+        """
+        while self.is_open() or self.probing:
+            await asyncio.sleep(max(self.open_until - time.monotonic(), 0.05))
+        if self.consecutive_failures >= self.circuit_failures:
+            self.probing = True
+
+    def score(self) -> float:
+        """Lower is better. Slow, failing and busy endpoints all get pushed back."""
+        return (self.latency + 0.01) * (self.in_flight + 1) * (1 + 10 * self.error_rate)
+
+    def record(self, elapsed: float, ok: bool):
+        self.probing = False
+        self.requests += 1
+        if self.requests == 1:
+            self.latency = elapsed
+        else:
+            self.latency += self.latency_decay * (elapsed - self.latency)
+        self.error_rate += self.latency_decay * ((0.0 if ok else 1.0) - self.error_rate)
+
+        if ok:
+            self.consecutive_failures = 0
+            return
+
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= self.circuit_failures and not self.is_open():
+            self.open_until = time.monotonic() + self.circuit_cooldown
+            log.warning(f"Circuit opened for {self.url} after {self.consecutive_failures} failures in a row. Pausing it for {self.circuit_cooldown}s")
+
+    def __repr__(self):
+        return f"{self.url} (latency {self.latency * 1000:.0f}ms, errors {self.error_rate:.0%}, lowest {self.lowest_height}, circuit {'open' if self.is_open() else 'closed'})"
+
+class EndpointPool:
+    """Spreads requests over several endpoints, preferring the healthiest one that has the requested height."""
+
+    def __init__(self, urls: str | list[str], circuit_failures: int = 5, circuit_cooldown: float = 30):
+        if isinstance(urls, str):
+            urls = [urls]
+        self.endpoints = [
+            Endpoint(url, circuit_failures=circuit_failures, circuit_cooldown=circuit_cooldown)
+            for url in urls
+        ]
+
+    def __iter__(self):
+        return iter(self.endpoints)
+
+    def pick(self, height: int = None) -> Endpoint:
+        candidates = self.endpoints
+        if height is not None:
+            candidates = [endpoint for endpoint in self.endpoints if endpoint.has_height(height)]
+            if not candidates:
+                log.debug(f"No endpoint reports height {height} as available. Trying all")
+                candidates = self.endpoints
+
+        closed = [endpoint for endpoint in candidates if not endpoint.is_open()]
+        if closed:
+            candidates = closed
+
+        if len(candidates) == 1:
+            return candidates[0]
+
+        # Power of two choices keeps the load spread instead of piling onto the single best endpoint
+        first, second = random.sample(candidates, 2)
+        return first if first.score() <= second.score() else second
+
+    def find(self, url: str) -> Endpoint | None:
+        for endpoint in self.endpoints:
+            if url.startswith(endpoint.url):
+                return endpoint
+
+    @property
+    def lowest_height(self) -> int | None:
+        heights = [endpoint.lowest_height for endpoint in self.endpoints if endpoint.lowest_height is not None]
+        return min(heights) if heights else None
@@ -1,4 +1,3 @@
-import asyncio
 import openpyxl
 import emoji
 
@@ -63,31 +62,12 @@ class Excel:
         validators = []
         next_key = None
 
-        async def fetch_with_retry(next_key, retries=3):
-            for attempt in range(retries):
-                try:
-                    result = await self.aio_session.fetch_validators(
-                        status=None,
-                        pagination_limit=100,
-                        next_key=next_key
-                    )
-                    if result and 'validators' in result:
-                        if attempt > 0:
-                            log.info(f"Successfully fetched {len(result['validators'])} validators after {attempt + 1} attempt(s).")
-                        return result
-                    else:
-                        raise ValueError("Invalid response")
-                    
-                except Exception as e:
-                    if attempt < retries - 1:
-                        log.warning(f"Retrying block validators request (attempt {attempt + 1}) due to: {e}")
-                        await asyncio.sleep(3)
-                    else:
-                        log.error(f"Failed to fetch validators after {retries} attempt(s).")
-                        return
-
         while True:
-            page = await fetch_with_retry(next_key)
+            page = await self.aio_session.fetch_with_retry(
+                description="validators",
+                request=lambda: self.aio_session.fetch_validators(status=None, pagination_limit=100, next_key=next_key),
+                is_valid=lambda result: 'validators' in result
+            )
             if not page:
                 exit(5)
             validators.extend(page["validators"])
@@ -121,6 +101,32 @@ class Excel:
         log.info(f"Succesfully fecthed {len(validators_result)} validators")
         return validators_result
     
+    async def get_totals(self, days: list[dict], fields: list[str]) -> dict:
+        """Reads the all-time rollup when it counts exactly the stored version of every day, otherwise sums the days on the server."""
+        rollup = await self.mongo.get_rollup(rollup_id='all')
+        if rollup and rollup['days'] == {day['_id']: day.get('digest') for day in days}:
+            return rollup['validators']
+
+        log.warning("All-time rollup does not match the stored days, summing daily stats instead. Run `main.py blocks --rebuild-rollups` to refresh it")
+        return await self.mongo.get_validator_totals(fields=fields)
+
+    async def count_votes(self) -> tuple[int, dict]:
+        """Streams governance documents one batch at a time into the number of proposals and {valoper: proposals voted}."""
+        proposals_count = 0
+        votes = {}
+        async for proposal in self.mongo.iter_processed_proposals(projection={'validators': 1}):
+            proposals_count += 1
+            for valoper, vote in proposal.get('validators', {}).items():
+                if vote.get('tx_hash'):
+                    votes[valoper] = votes.get(valoper, 0) + 1
+        log.info(f"Counted votes of {len(votes)} validators on {proposals_count} proposals")
+        return proposals_count, votes
+
+    async def get_validator_slashes(self, validators: list[dict]) -> dict:
+        """Streams the slashes of the given validators only. Returns {valoper: slashes}."""
+        cursor = self.mongo.iter_slashes(valopers=[validator['valoper'] for validator in validators], projection={'slashes': 1})
+        return {entry['_id']: entry['slashes'] async for entry in cursor if entry.get('slashes')}
+
     def create_excel_sheet(self) -> tuple[Worksheet, Workbook]:
         try:
             workbook = openpyxl.load_workbook(self.excel_file_name)
@@ -138,49 +144,32 @@ class Excel:
         sheet: Worksheet,
         workbook: Workbook,
         validators: list[dict],
-        days_stats: list[dict],
-        slashes: list[dict],
-        proposals: list[dict]
+        days: list[dict],
+        totals: dict,
+        day_uptimes: dict,
+        slashes: dict,
+        proposals_count: int,
+        votes: dict
     ) -> None:
         
-        self.headers = ["Moniker", "Validator Address", "Tombstoned", f"Voted Proposals ({len(proposals)})", "Jails", "Signed ✔", "Missed ❌", "Proposed 🚩", "Uptime"]
+        self.headers = ["Moniker", "Validator Address", "Tombstoned", f"Voted Proposals ({proposals_count})", "Jails", "Signed ✔", "Missed ❌", "Proposed 🚩", "Uptime"]
         
-        sorted_dates = sorted(days_stats, key=lambda entry: entry['date_start_height'])
+        sorted_dates = sorted(days, key=lambda entry: entry['date_start_height'])
 
         for validator in validators:
-            total_signed_blocks = 0
-            total_missed_blocks = 0
-            total_proposed_blocks = 0
             _hex = validator['hex']
             _valoper = validator['valoper']
 
-            for day in sorted_dates:
-                day_signed_blocks = day['validators'].get(_hex, {}).get('signed_blocks', 0)
-                day_missed_blocks = day['validators'].get(_hex, {}).get('missed_blocks', 0)
-                day_proposed_blocks = day['validators'].get(_hex, {}).get('proposed_blocks', 0)
-                total_signed_blocks += day_signed_blocks
-                total_missed_blocks += day_missed_blocks
-                total_proposed_blocks += day_proposed_blocks
-
-            validator['total_signed_blocks'] = total_signed_blocks
-            validator['total_missed_blocks'] = total_missed_blocks
-            validator['total_proposed_blocks'] = total_proposed_blocks
+            validator_totals = totals.get(_hex, {})
+            validator['total_signed_blocks'] = validator_totals.get('signed_blocks', 0)
+            validator['total_missed_blocks'] = validator_totals.get('missed_blocks', 0)
+            validator['total_proposed_blocks'] = validator_totals.get('proposed_blocks', 0)
 
             # Slashes
-            validator['total_slashes'] = 0
-            validator['slashes'] = []
-            for entry in slashes:
-                if entry['_id'] == _valoper and entry['slashes']:
-                    validator['total_slashes'] = len(entry['slashes'])
-                    validator['slashes'] = entry['slashes']
-                    break
+            validator['slashes'] = slashes.get(_valoper, [])
+            validator['total_slashes'] = len(validator['slashes'])
             # Gov
-            total_voted_proposals = 0
-            for proposal in proposals:
-                vote = proposal['validators'].get(_valoper,{}).get('tx_hash')
-                if vote:
-                    total_voted_proposals += 1
-            validator['total_voted_proposals'] = total_voted_proposals
+            validator['total_voted_proposals'] = votes.get(_valoper, 0)
 
         sorted_validators = sorted(validators, key=lambda x: x["total_signed_blocks"] + x["total_missed_blocks"], reverse=True)
 
@@ -210,7 +199,7 @@ class Excel:
             valoper = validator["valoper"]
             hex_addr = validator["hex"]
             tombstoned = str(validator["tombstoned"])
-            gov_participation =  validator['total_voted_proposals'] / len(proposals)
+            gov_participation =  validator['total_voted_proposals'] / proposals_count
             total_signed = validator["total_signed_blocks"]
             total_missed = validator["total_missed_blocks"]
             total_proposed = validator["total_proposed_blocks"]
@@ -219,32 +208,21 @@ class Excel:
                 if (total_signed + total_missed) > 0 else 0.0
             ),6)
 
-            uptime_days = []
-            for day in sorted_dates:
-                signed = day['validators'].get(hex_addr, {}).get('signed_blocks', 0)
-                missed = day['validators'].get(hex_addr, {}).get('missed_blocks', 0)
-                day_uptime = round((
-                    (signed / (signed + missed))
-                    if (signed + missed) > 0 else 0.0
-                ),6)
-                
-                if (signed + missed) > 0:
-                    uptime_days.append(day_uptime)
-
-                    if day_uptime >= 0.90:
-                        uptime_color = self.light_green_fill
-                    elif day_uptime >= 0.60:
-                        uptime_color = self.light_yellow_fill
-                    else:
-                        uptime_color = self.light_red_fill
-
-                    uptime_cell = sheet.cell(row=row_num, column=day_to_col_num[day['_id']], value=day_uptime)
-                    uptime_cell.font = self.balck_bold_font
-                    uptime_cell.alignment = self.center_alignment
-
-                    uptime_cell.fill = uptime_color
-                    uptime_cell.border = self.light_border
-                    uptime_cell.number_format = '0.0000%'
+            for date, day_uptime in day_uptimes.get(hex_addr, {}).items():
+                if day_uptime >= 0.90:
+                    uptime_color = self.light_green_fill
+                elif day_uptime >= 0.60:
+                    uptime_color = self.light_yellow_fill
+                else:
+                    uptime_color = self.light_red_fill
+
+                uptime_cell = sheet.cell(row=row_num, column=day_to_col_num[date], value=day_uptime)
+                uptime_cell.font = self.balck_bold_font
+                uptime_cell.alignment = self.center_alignment
+
+                uptime_cell.fill = uptime_color
+                uptime_cell.border = self.light_border
+                uptime_cell.number_format = '0.0000%'
 
             cell_moniker = sheet.cell(row=row_num, column=1, value=moniker)
             cell_moniker.alignment = self.left_alignment
@@ -442,24 +420,19 @@ class Excel:
         sheet: Worksheet,
         workbook: Workbook,
         validators: list[dict],
-        days_stats: list[dict],
+        days: list[dict],
+        totals: dict,
+        day_uptimes: dict,
     ) -> None:
         
         self.headers = ["Moniker", "Validator Address", "Prices ✔", "No Prices ❌", "Uptime"]
         
-        sorted_dates = sorted(days_stats, key=lambda entry: entry['date_start_height'])
+        sorted_dates = sorted(days, key=lambda entry: entry['date_start_height'])
 
         for validator in validators:
-            total_signed_oracle = 0
-            total_missed_oracle = 0
-            _hex = validator['hex']
-            for day in sorted_dates:
-                day_signed_oracle = day['validators'].get(_hex, {}).get('signed_oracle', 0)
-                day_missed_oracle = day['validators'].get(_hex, {}).get('missed_oracle', 0)
-                total_signed_oracle += day_signed_oracle
-                total_missed_oracle += day_missed_oracle
-            validator['total_signed_oracle'] = total_signed_oracle
-            validator['total_missed_oracle'] = total_missed_oracle
+            validator_totals = totals.get(validator['hex'], {})
+            validator['total_signed_oracle'] = validator_totals.get('signed_oracle', 0)
+            validator['total_missed_oracle'] = validator_totals.get('missed_oracle', 0)
 
         sorted_validators = sorted(validators, key=lambda x: x["total_signed_oracle"] + x["total_missed_oracle"], reverse=True)
 
@@ -495,32 +468,21 @@ class Excel:
                 if (total_signed_oracle + total_missed_oracle) > 0 else 0.0
             ),6)
 
-            uptime_days = []
-            for day in sorted_dates:
-                signed = day['validators'].get(hex_addr, {}).get('signed_oracle', 0)
-                missed = day['validators'].get(hex_addr, {}).get('missed_oracle', 0)
-                day_uptime = round((
-                    (signed / (signed + missed))
-                    if (signed + missed) > 0 else 0.0
-                ),6)
-                
-                if (signed + missed) > 0:
-                    uptime_days.append(day_uptime)
-
-                    if day_uptime >= 0.90:
-                        uptime_color = self.light_green_fill
-                    elif day_uptime >= 0.60:
-                        uptime_color = self.light_yellow_fill
-                    else:
-                        uptime_color = self.light_red_fill
-
-                    uptime_cell = sheet.cell(row=row_num, column=day_to_col_num[day['_id']], value=day_uptime)
-                    uptime_cell.font = self.balck_bold_font
-                    uptime_cell.alignment = self.center_alignment
-
-                    uptime_cell.fill = uptime_color
-                    uptime_cell.border = self.light_border
-                    uptime_cell.number_format = '0.0000%'
+            for date, day_uptime in day_uptimes.get(hex_addr, {}).items():
+                if day_uptime >= 0.90:
+                    uptime_color = self.light_green_fill
+                elif day_uptime >= 0.60:
+                    uptime_color = self.light_yellow_fill
+                else:
+                    uptime_color = self.light_red_fill
+
+                uptime_cell = sheet.cell(row=row_num, column=day_to_col_num[date], value=day_uptime)
+                uptime_cell.font = self.balck_bold_font
+                uptime_cell.alignment = self.center_alignment
+
+                uptime_cell.fill = uptime_color
+                uptime_cell.border = self.light_border
+                uptime_cell.number_format = '0.0000%'
 
             cell_moniker = sheet.cell(row=row_num, column=1, value=moniker)
             cell_moniker.alignment = self.left_alignment
@@ -650,20 +612,29 @@ class Excel:
             exit(5)
 
         log.info("Fetching daily stats…")
-        days_stats = await self.mongo.get_validator_stats_days()
-        if not days_stats:
+        days = await self.mongo.get_day_ranges()
+        if not days:
             log.error("No daily stats found, exiting.")
             exit(5)
 
         log.info("Fetching slashes…")
-        slashes = await self.mongo.get_slashes()
-        if not slashes:
-            log.error("No slashes found, exiting.")
-            exit(5)
+        if self.excel_sheet_name == "Main":
+            # Validators that were never slashed simply have no document
+            slashes = await self.get_validator_slashes(validators=validators)
+        else:
+            slashes = await self.mongo.get_slashes()
+            if not slashes:
+                log.error("No slashes found, exiting.")
+                exit(5)
 
         log.info("Fetching proposals…")
-        proposals = await self.mongo.get_processed_proposals()
-        if not proposals:
+        if self.excel_sheet_name == "Main":
+            # Main only shows vote counts, so proposals are streamed instead of loaded with every vote
+            proposals_count, votes = await self.count_votes()
+        else:
+            proposals = await self.mongo.get_processed_proposals()
+            proposals_count = len(proposals)
+        if not proposals_count:
             log.error("No proposals found, exiting.")
             exit(5)
 
@@ -676,9 +647,12 @@ class Excel:
                 sheet=sheet,
                 workbook=workbook,
                 validators=validators,
-                days_stats=days_stats,
+                days=days,
+                totals=await self.get_totals(days=days, fields=['signed_blocks', 'missed_blocks', 'proposed_blocks']),
+                day_uptimes=await self.mongo.get_validator_day_uptimes(signed_field='signed_blocks', missed_field='missed_blocks'),
                 slashes=slashes,
-                proposals=proposals
+                proposals_count=proposals_count,
+                votes=votes
             )
 
         elif self.excel_sheet_name == "Gov":
@@ -694,7 +668,9 @@ class Excel:
                 sheet=sheet,
                 workbook=workbook,
                 validators=validators,
-                days_stats=days_stats,
+                days=days,
+                totals=await self.get_totals(days=days, fields=['signed_oracle', 'missed_oracle']),
+                day_uptimes=await self.mongo.get_validator_day_uptimes(signed_field='signed_oracle', missed_field='missed_oracle'),
             )
         
         if self.excel_sheet_name == "Slashes":
@@ -0,0 +1,103 @@
+import json
+import re
+import time
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+DECODERS = {'json': json.loads}
+if orjson:
+    DECODERS['orjson'] = orjson.loads
+
+def get_json_loads(name: str = 'auto'):
+    """
+    Returns (name, loads) for the requested decoder. 'auto' picks orjson when it is installed.
+
+    Every decoder takes the raw response bytes, so the body never has to be decoded to str first.
+    """
+    if name == 'auto':
+        name = 'orjson' if orjson else 'json'
+    if name not in DECODERS:
+        raise ValueError(f"JSON decoder {name} is not available. Installed: {', '.join(DECODERS)}")
+    return name, DECODERS[name]
+
+TXS_PATTERN = re.compile(rb'"txs"\s*:\s*\[')
+SIGNATURE_PATTERN = re.compile(rb'"signature"\s*:\s*"[^"]*"')
+
+def trim_block(body: bytes) -> bytes:
+    """
+    Cuts every data.txs array down to its first tx and drops commit signature bytes before decoding,
+    so the rest of the /block response is parsed without materialising the full tx list.
+
+    Txs and signatures are base64 strings, which never contain quotes or brackets,
+    so the array and string ends can be found with a plain byte search.
+    """
+    parts = []
+    position = 0
+    for match in TXS_PATTERN.finditer(body):
+        if match.start() < position:
+            continue
+        array_end = body.index(b']', match.end())
+        first_tx_start = body.find(b'"', match.end(), array_end)
+        parts.append(body[position:match.end()])
+        if first_tx_start != -1:
+            first_tx_end = body.index(b'"', first_tx_start + 1)
+            parts.append(body[first_tx_start:first_tx_end + 1])
+        position = array_end
+    parts.append(body[position:])
+    return strip_signatures(b''.join(parts))
+
+def strip_signatures(body: bytes) -> bytes:
+    """Replaces commit signature bytes with null, keeping validator addresses, flags and timestamps."""
+    return SIGNATURE_PATTERN.sub(b'"signature":null', body)
+
+def benchmark(payloads: list[bytes], rounds: int = 20) -> dict:
+    """Returns the mean decode time per response in milliseconds for every installed decoder."""
+    results = {}
+    for name, loads in DECODERS.items():
+        started = time.perf_counter()
+        for _ in range(rounds):
+            for payload in payloads:
+                loads(payload)
+        results[name] = (time.perf_counter() - started) / (rounds * len(payloads)) * 1000
+
+        started = time.perf_counter()
+        for _ in range(rounds):
+            for payload in payloads:
+                loads(trim_block(payload))
+        results[f"{name} + trim"] = (time.perf_counter() - started) / (rounds * len(payloads)) * 1000
+    return results
+
+
+if __name__ == "__main__":
+    import base64
+    import os
+    import sys
+
+    # Pass saved /block or /commit responses as arguments, otherwise a synthetic /block with 300 txs is used
+    if len(sys.argv) > 1:
+        payloads = [open(path, 'rb').read() for path in sys.argv[1:]]
+    else:
+        block = {
+            "jsonrpc": "2.0",
+            "id": -1,
+            "result": {
+                "block": {
+                    "header": {"height": "1000000", "time": "2025-01-01T00:00:00.000000000Z", "proposer_address": "AB" * 20},
+                    "data": {"txs": [base64.b64encode(os.urandom(1024)).decode() for _ in range(300)]},
+                    "last_commit": {
+                        "signatures": [
+                            {"block_id_flag": 2, "validator_address": os.urandom(20).hex().upper(), "timestamp": "2025-01-01T00:00:00.000000000Z", "signature": base64.b64encode(os.urandom(64)).decode()}
+                            for _ in range(100)
+                        ]
+                    }
+                }
+            }
+        }
+        payloads = [json.dumps(block).encode()]
+
+    size = sum(len(payload) for payload in payloads) / len(payloads) / 1024
+    for name, ms in benchmark(payloads).items():
+        print(f"{name:>15}: {ms:.3f}ms per response ({size:.0f}KB avg)")
@@ -92,31 +92,12 @@ EARLIEST BLOCK: {earliest_store_height}
         validators = []
         next_key = None
 
-        async def fetch_with_retry(next_key, retries=3):
-            for attempt in range(retries):
-                try:
-                    result = await self.aio_session.fetch_validators(
-                        status=None,
-                        pagination_limit=100,
-                        next_key=next_key
-                    )
-                    if result and 'validators' in result:
-                        if attempt > 0:
-                            log.info(f"Successfully fetched {len(result['validators'])} validators after {attempt + 1} attempt(s).")
-                        return result
-                    else:
-                        raise ValueError("Invalid response")
-                    
-                except Exception as e:
-                    if attempt < retries - 1:
-                        log.warning(f"Retrying block validators request (attempt {attempt + 1}) due to: {e}")
-                        await asyncio.sleep(3)
-                    else:
-                        log.error(f"Failed to fetch validators after {retries} attempt(s).")
-                        return
-
         while True:
-            page = await fetch_with_retry(next_key)
+            page = await self.aio_session.fetch_with_retry(
+                description="validators",
+                request=lambda: self.aio_session.fetch_validators(status=None, pagination_limit=100, next_key=next_key),
+                is_valid=lambda result: 'validators' in result
+            )
             if not page:
                 exit(5)
             validators.extend(page["validators"])
@@ -149,31 +130,12 @@ EARLIEST BLOCK: {earliest_store_height}
         proposals = []
         next_key = None
 
-        async def fetch_with_retry(next_key, retries=3):
-            for attempt in range(retries):
-                try:
-                    result = await self.aio_session.fetch_proposals(
-                        status=None,
-                        pagination_limit=100,
-                        next_key=next_key
-                    )
-                    if result and 'proposals' in result:
-                        if attempt > 0:
-                            log.info(f"Successfully fetched {len(result['proposals'])} proposals after {attempt + 1} attempt(s).")
-                        return result
-                    else:
-                        raise ValueError("Invalid response")
-                    
-                except Exception as e:
-                    if attempt < retries - 1:
-                        log.warning(f"Retrying block proposals request (attempt {attempt + 1}) due to: {e}")
-                        await asyncio.sleep(3)
-                    else:
-                        log.error(f"Failed to fetch proposals after {retries} attempt(s).")
-                        return
-
         while True:
-            page = await fetch_with_retry(next_key)
+            page = await self.aio_session.fetch_with_retry(
+                description="proposals",
+                request=lambda: self.aio_session.fetch_proposals(status=None, pagination_limit=100, next_key=next_key),
+                is_valid=lambda result: 'proposals' in result
+            )
             if not page:
                 exit(5)
             proposals.extend(page["proposals"])
@@ -213,7 +175,7 @@ EARLIEST BLOCK: {earliest_store_height}
 
         validators = await self.get_validators()
         proposals = await self.get_proposals()
-        processed_proposals = await self.mongo.get_processed_proposals()
+        processed_proposals = await self.mongo.get_processed_proposals(projection={'_id': 1})
 
         if processed_proposals == []:
             log.warning(f"0 processed proposals found in DB")
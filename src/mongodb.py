@@ -1,7 +1,72 @@
+import hashlib
+import json
 import motor.motor_asyncio
+from datetime import date as Date
 from utils.logger import log
 from utils.config import Config
-from pymongo.errors import DuplicateKeyError
+from pymongo import DeleteMany, ReplaceOne, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+def validator_day_rows(date: str, stats: dict) -> list[ReplaceOne | DeleteMany]:
+    """
+    Writes of the normalised validator_days layout: one document per (date, hex) with the day counters as fields.
+    Rows of the date for validators no longer in stats are deleted, so a rewritten day leaves no stale rows.
+    """
+    return [
+        DeleteMany({'date': date, 'hex': {'$nin': list(stats)}}),
+        *(
+            ReplaceOne({'_id': f"{date}_{hex}"}, {'_id': f"{date}_{hex}", 'date': date, 'hex': hex, **counters}, upsert=True)
+            for hex, counters in stats.items()
+        )
+    ]
+
+def rollup_periods(date: str) -> list[tuple[str, str]]:
+    """Returns the (period, _id) of every validator_rollups document a day belongs to: its ISO week, month and all-time."""
+    year, week, _ = Date.fromisoformat(date).isocalendar()
+    return [('week', f"week:{year}-W{week:02d}"), ('month', f"month:{date[:7]}"), ('all', "all")]
+
+def day_digest(date_start_height: int, date_end_height: int, stats: dict) -> str:
+    """Fingerprint of a stored day, kept in its daily_validator_stats document and in every rollup that counts it."""
+    payload = json.dumps([date_start_height, date_end_height, stats], sort_keys=True, separators=(',', ':'))
+    return hashlib.blake2b(payload.encode(), digest_size=8).hexdigest()
+
+def rollup_updates(date: str, digest: str, stats: dict, old: dict = None) -> list[UpdateOne]:
+    """
+    Moves the rollups of a day from its stored version old (None when the day is new) to stats.
+
+    Every rollup maps the days it counts to their digest. A new day is added with its counters to rollups that do not
+    list it yet, a rewritten day adds the difference to its old counters to rollups that list its old digest.
+    An update that was already applied no longer matches its filter, so writing the same day twice is a no-op.
+    """
+    if old is None:
+        increments = {
+            f'validators.{hex}.{field}': value
+            for hex, counters in stats.items()
+            for field, value in counters.items()
+        }
+        query = {'$exists': False}
+    else:
+        if old['digest'] == digest:
+            return []
+        increments = {}
+        for hex in stats.keys() | old['validators'].keys():
+            counters = stats.get(hex, {})
+            old_counters = old['validators'].get(hex, {})
+            for field in counters.keys() | old_counters.keys():
+                delta = counters.get(field, 0) - old_counters.get(field, 0)
+                if delta:
+                    increments[f'validators.{hex}.{field}'] = delta
+        query = old['digest']
+
+    return [
+        UpdateOne(
+            {'_id': rollup_id, f'days.{date}': query},
+            {'$set': {f'days.{date}': digest}, '$setOnInsert': {'period': period}, **({'$inc': increments} if increments else {})},
+            # A day already stored before its rollup existed is only counted again by rebuild_rollups()
+            upsert=old is None
+        )
+        for period, rollup_id in rollup_periods(date)
+    ]
 
 class MongoDBHandler:
     def __init__(self, config: Config):
@@ -21,6 +86,10 @@ class MongoDBHandler:
             log.error(f"❌ Failed to connect to MongoDB: {e}")
             raise
 
+        await self.database['height_index'].create_index('start_height')
+        await self.database['validator_days'].create_index([('hex', 1), ('date', 1)])
+        await self.database['validator_days'].create_index('date')
+
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
@@ -28,6 +97,7 @@ class MongoDBHandler:
         log.info("🛑 MongoDB connection closed.")
 
     async def update_latest_processed_block(self, height: int, time: str, chain_id: str) -> bool:
+        """Moves the lock forward to height. Returns False and leaves it as is when it already is at or past height, e.g. on a re-run."""
         collection = self.database['lock']
 
         if not isinstance(height, int) or height < 0:
@@ -39,7 +109,7 @@ class MongoDBHandler:
             current = existing.get('latest_processed_block', 0)
             if height <= current:
                 log.warning(f"Ignored outdated height update: {height} <= {current}")
-                raise Exception
+                return False
             
         await collection.update_one(
             {'_id': 'lock'},
@@ -51,6 +121,39 @@ class MongoDBHandler:
             upsert=True
         )
         log.info(f"Updated latest_processed_block to {height}")
+        return True
+
+    async def update_checkpoint(
+        self,
+        height: int,
+        date: str,
+        day_start_height: int,
+        chain_id: str,
+        stats: dict,
+        times: bytes,
+        runs: list[dict] = None
+    ):
+        """Replaces the checkpoint of the unfinished day. Everything lives in one document, so it is written atomically."""
+        collection = self.database['lock']
+        await collection.replace_one(
+            {'_id': 'checkpoint'},
+            {
+                '_id': 'checkpoint',
+                'height': height,
+                'date': date,
+                'day_start_height': day_start_height,
+                'chain_id': chain_id,
+                'stats': stats,
+                'times': times,
+                'runs': runs,
+            },
+            upsert=True
+        )
+        log.info(f"Saved checkpoint for {date} at height {height}")
+
+    async def get_checkpoint(self) -> dict:
+        collection = self.database['lock']
+        return await collection.find_one({'_id': 'checkpoint'})
 
     async def get_latest_processed_block(self) -> dict:
         """ Returns {'height': int, 'time': 'YYYY-MM-DD'} """
@@ -63,22 +166,339 @@ class MongoDBHandler:
                 'chain_id':   lock['chain_id'],
             }
         
-    async def insert_daily_validator_stats(self, date: str, date_end_height: int, date_start_height: int, stats: dict):
-        """Writes one document per day of aggregated validator metrics."""
+    async def write_days(self, days: list[dict], chain_id: str):
+        """
+        Writes a run of finished days with one bulk upsert per collection, then moves the lock past the last of them.
+        Every day is {date, date_start_height, date_end_height, stats, runs, times}, runs and times may be None.
+        times are the block times of the day packed as uint32 milliseconds since midnight UTC, one per height from date_start_height.
+        Upserts keyed by date and start height make a repeated write of the same days a no-op.
+
+        Rollups are moved from the stored version of every day to the new one before the day itself is replaced,
+        so a write interrupted in between is finished by writing the same days again.
+        """
         collection = self.database['daily_validator_stats']
-        await collection.insert_one({
-            '_id': date,
-            'date_start_height': date_start_height,
-            'date_end_height': date_end_height,
-            'validators': stats,
-        })
+        old_days = {
+            doc['_id']: {**doc, 'digest': day_digest(doc['date_start_height'], doc['date_end_height'], doc['validators'])}
+            async for doc in collection.find({'_id': {'$in': [day['date'] for day in days]}})
+        }
+        digests = {
+            day['date']: day_digest(day['date_start_height'], day['date_end_height'], day['stats'])
+            for day in days
+        }
+
+        await self.update_rollups(updates=[
+            update for day in days
+            for update in rollup_updates(date=day['date'], digest=digests[day['date']], stats=day['stats'], old=old_days.get(day['date']))
+        ])
+
+        await collection.bulk_write([
+            ReplaceOne(
+                {'_id': day['date']},
+                {
+                    '_id': day['date'],
+                    'date_start_height': day['date_start_height'],
+                    'date_end_height': day['date_end_height'],
+                    'digest': digests[day['date']],
+                    'validators': day['stats'],
+                },
+                upsert=True
+            )
+            for day in days
+        ], ordered=False)
+
+        rows = [row for day in days for row in validator_day_rows(date=day['date'], stats=day['stats'])]
+        if rows:
+            await self.database['validator_days'].bulk_write(rows, ordered=False)
 
-        log.info(f"Inserted validator_stats for {date} ({date_start_height} -> {date_start_height})")
+        bitmaps = [
+            ReplaceOne({'_id': run['start_height']}, {'_id': run['start_height'], 'date': day['date'], **run}, upsert=True)
+            for day in days if day['runs'] for run in day['runs']
+        ]
+        if bitmaps:
+            await self.database['block_bitmaps'].bulk_write(bitmaps, ordered=False)
+
+        height_index = [
+            ReplaceOne(
+                {'_id': day['date']},
+                {
+                    '_id': day['date'],
+                    'start_height': day['date_start_height'],
+                    'end_height': day['date_end_height'],
+                    'times': day['times'],
+                },
+                upsert=True
+            )
+            for day in days if day['times']
+        ]
+        if height_index:
+            await self.database['height_index'].bulk_write(height_index, ordered=False)
+
+        log.info(f"Inserted validator_stats for {len(days)} day(s): {days[0]['date']} -> {days[-1]['date']} ({days[0]['date_start_height']} -> {days[-1]['date_end_height']})")
+        await self.update_latest_processed_block(
+            height=days[-1]['date_end_height'],
+            time=days[-1]['date'],
+            chain_id=chain_id
+        )
+
+    async def update_rollups(self, updates: list[UpdateOne]):
+        if not updates:
+            return
+        try:
+            await self.database['validator_rollups'].bulk_write(updates, ordered=False)
+        except BulkWriteError as e:
+            errors = [error for error in e.details['writeErrors'] if error['code'] != 11000]
+            if errors:
+                raise
+            log.info(f"Skipped {len(e.details['writeErrors'])} rollup update(s) of days already counted")
 
-    async def get_validator_stats_days(self) -> list[dict]:
+    async def rebuild_rollups(self, rows_batch_days: int = 100):
+        """
+        Recomputes every weekly, monthly and all-time rollup from daily_validator_stats, streaming one day at a time.
+        Days stored without a digest get one, so get_day_ranges() can be compared with the rebuilt rollups.
+        The validator_days rows are rewritten on the way, rows_batch_days days per bulk write, which also
+        fills them in for days stored before the collection existed.
+        """
         collection = self.database['daily_validator_stats']
-        cursor = collection.find({})
+        rollups = {}
+        digests = []
+        dates = []
+        rows = []
+        async for day in self.iter_validator_stats_days():
+            digest = day_digest(day['date_start_height'], day['date_end_height'], day['validators'])
+            if day.get('digest') != digest:
+                digests.append(UpdateOne({'_id': day['_id']}, {'$set': {'digest': digest}}))
+
+            dates.append(day['_id'])
+            rows.extend(validator_day_rows(date=day['_id'], stats=day['validators']))
+            if len(dates) % rows_batch_days == 0:
+                await self.database['validator_days'].bulk_write(rows, ordered=False)
+                rows = []
+
+            for period, rollup_id in rollup_periods(day['_id']):
+                rollup = rollups.setdefault(rollup_id, {'_id': rollup_id, 'period': period, 'days': {}, 'validators': {}})
+                rollup['days'][day['_id']] = digest
+                for hex, counters in day['validators'].items():
+                    totals = rollup['validators'].setdefault(hex, {})
+                    for field, value in counters.items():
+                        totals[field] = totals.get(field, 0) + value
+
+        if digests:
+            await collection.bulk_write(digests, ordered=False)
+
+        if rows:
+            await self.database['validator_days'].bulk_write(rows, ordered=False)
+        await self.database['validator_days'].delete_many({'date': {'$nin': dates}})
+        log.info(f"Rewrote validator_days rows for {len(dates)} days")
+
+        collection = self.database['validator_rollups']
+        if rollups:
+            await collection.bulk_write([ReplaceOne({'_id': rollup_id}, rollup, upsert=True) for rollup_id, rollup in rollups.items()], ordered=False)
+        await collection.delete_many({'_id': {'$nin': list(rollups)}})
+        log.info(f"Rebuilt {len(rollups)} validator rollups")
+
+    async def get_rollup(self, rollup_id: str) -> dict:
+        """Returns a validator_rollups document: 'all', 'month:YYYY-MM' or 'week:YYYY-Www'."""
+        collection = self.database['validator_rollups']
+        return await collection.find_one({'_id': rollup_id})
+
+    async def get_rollups(self, period: str, projection: dict = None) -> list[dict]:
+        """Returns every rollup of a period ('week', 'month' or 'all'), ordered by _id."""
+        collection = self.database['validator_rollups']
+        cursor = collection.find({'period': period}, projection).sort('_id', 1)
         docs = await cursor.to_list(length=None)
+        log.info(f"Fetched {len(docs)} {period} rollups")
+        return docs
+
+    async def replace_daily_validator_stats(self, days: list[dict]):
+        """Rewrites whole day documents in one bulk upsert. Every day is a daily_validator_stats document with _id = date."""
+        collection = self.database['daily_validator_stats']
+        if not days:
+            return
+
+        await collection.bulk_write([
+            ReplaceOne(
+                {'_id': day['_id']},
+                {**day, 'digest': day_digest(day['date_start_height'], day['date_end_height'], day['validators'])},
+                upsert=True
+            )
+            for day in days
+        ], ordered=False)
+        rows = [row for day in days for row in validator_day_rows(date=day['_id'], stats=day['validators'])]
+        if rows:
+            await self.database['validator_days'].bulk_write(rows, ordered=False)
+        log.info(f"Rewrote validator_stats for {len(days)} days ({days[0]['_id']} -> {days[-1]['_id']})")
+
+    async def get_day_ranges(self, **filters) -> list[dict]:
+        """Returns {_id, date_start_height, date_end_height, digest} of the stored days matching iter_validator_stats_days filters, ordered by date."""
+        return await self.get_validator_stats_days(
+            projection={'date_start_height': 1, 'date_end_height': 1, 'digest': 1},
+            batch_size=1000,
+            **filters
+        )
+
+    async def get_valset(self, validators_hash: str) -> list[str]:
+        """Returns the ordered hex addresses stored for validators_hash"""
+        collection = self.database['valsets']
+        valset = await collection.find_one({'_id': validators_hash})
+        if valset:
+            return valset['validators']
+
+    async def insert_valset(self, validators_hash: str, height: int, validators: list[str]):
+        collection = self.database['valsets']
+        await collection.update_one(
+            {'_id': validators_hash},
+            {
+                '$setOnInsert': {
+                    'first_seen_height': height,
+                    'validators': validators,
+                }
+            },
+            upsert=True
+        )
+        log.info(f"Stored valset {validators_hash} first seen at height {height} ({len(validators)} validators)")
+
+    async def insert_block_bitmaps(self, date: str, runs: list[dict]):
+        """
+        Stores packed per-block signer and oracle bitmaps, one document per run of blocks sharing a valset.
+        Bit i of a row belongs to validator i of valsets[validators_hash].
+        """
+        collection = self.database['block_bitmaps']
+        if not runs:
+            return
+
+        await collection.bulk_write([
+            ReplaceOne({'_id': run['start_height']}, {'_id': run['start_height'], 'date': date, **run}, upsert=True)
+            for run in runs
+        ])
+        log.info(f"Inserted block_bitmaps for {date} ({runs[0]['start_height']} -> {runs[-1]['end_height']}, {len(runs)} run(s))")
+
+    async def get_block_bitmaps(self, start_height: int, end_height: int) -> list[dict]:
+        """Returns the bitmap runs overlapping [start_height, end_height], ordered by height."""
+        collection = self.database['block_bitmaps']
+        cursor = collection.find({
+            '_id': {'$lte': end_height},
+            'end_height': {'$gte': start_height},
+        }).sort('_id', 1)
+        docs = await cursor.to_list(length=None)
+        log.info(f"Fetched {len(docs)} block bitmap runs for {start_height} -> {end_height}")
+        return docs
+
+    async def get_height_index(self, height: int = None, date: str = None) -> dict:
+        """Returns the height_index day that holds height, or the day of date."""
+        collection = self.database['height_index']
+        if date is not None:
+            return await collection.find_one({'_id': date})
+
+        day = await collection.find_one({'start_height': {'$lte': height}}, sort=[('start_height', -1)])
+        if day and day['end_height'] >= height:
+            return day
+
+    def iter_validator_days(
+        self,
+        hex: str = None,
+        start_date: str = None,
+        end_date: str = None,
+        projection: dict = None,
+        batch_size: int = 1000
+    ) -> motor.motor_asyncio.AsyncIOMotorCursor:
+        """
+        Streams validator_days rows ordered by date, for one validator and/or an inclusive date range.
+        Served by the (hex, date) and (date) indexes, so only the matching rows are read.
+        Query API for dashboards over the normalised layout.
+        """
+        collection = self.database['validator_days']
+        query = {}
+        if hex is not None:
+            query['hex'] = hex
+        if start_date is not None or end_date is not None:
+            query['date'] = {}
+            if start_date is not None:
+                query['date']['$gte'] = start_date
+            if end_date is not None:
+                query['date']['$lte'] = end_date
+
+        return collection.find(query, projection or {'_id': 0}).sort('date', 1).batch_size(batch_size)
+
+    async def get_validator_days(self, **filters) -> list[dict]:
+        """Returns the rows of iter_validator_days(**filters) as a list."""
+        docs = await self.iter_validator_days(**filters).to_list(length=None)
+        log.info(f"Fetched {len(docs)} validator days")
+        return docs
+
+    async def get_validator_totals(self, fields: list[str]) -> dict:
+        """Sums the given counters of every validator over all days on the server. Returns {hex: {field: total}}."""
+        collection = self.database['daily_validator_stats']
+        cursor = collection.aggregate([
+            {'$project': {'validators': {'$objectToArray': '$validators'}}},
+            {'$unwind': '$validators'},
+            {'$group': {
+                '_id': '$validators.k',
+                **{field: {'$sum': f'$validators.v.{field}'} for field in fields}
+            }},
+        ], allowDiskUse=True)
+        totals = {doc.pop('_id'): doc async for doc in cursor}
+        log.info(f"Aggregated totals of {len(totals)} validators")
+        return totals
+
+    async def get_validator_day_uptimes(self, signed_field: str, missed_field: str) -> dict:
+        """
+        Computes signed / (signed + missed) per validator and day on the server, rounded to 6 digits.
+        Days a validator has no signed or missed blocks in are left out. Returns {hex: {date: uptime}}.
+        """
+        collection = self.database['daily_validator_stats']
+        cursor = collection.aggregate([
+            {'$project': {'validators': {'$objectToArray': '$validators'}}},
+            {'$unwind': '$validators'},
+            {'$project': {
+                'hex': '$validators.k',
+                'signed': {'$ifNull': [f'$validators.v.{signed_field}', 0]},
+                'total': {'$add': [
+                    {'$ifNull': [f'$validators.v.{signed_field}', 0]},
+                    {'$ifNull': [f'$validators.v.{missed_field}', 0]},
+                ]},
+            }},
+            {'$match': {'total': {'$gt': 0}}},
+            {'$group': {
+                '_id': '$hex',
+                'days': {'$push': {'k': '$_id', 'v': {'$round': [{'$divide': ['$signed', '$total']}, 6]}}},
+            }},
+            {'$project': {'days': {'$arrayToObject': '$days'}}},
+        ], allowDiskUse=True)
+        uptimes = {doc['_id']: doc['days'] async for doc in cursor}
+        log.info(f"Aggregated daily {signed_field} uptime of {len(uptimes)} validators")
+        return uptimes
+
+    def iter_validator_stats_days(
+        self,
+        projection: dict = None,
+        start_date: str = None,
+        end_date: str = None,
+        start_height: int = None,
+        end_height: int = None,
+        batch_size: int = 100
+    ) -> motor.motor_asyncio.AsyncIOMotorCursor:
+        """
+        Streams daily_validator_stats ordered by date, batch_size documents per round trip.
+        Dates and heights are inclusive bounds, projection limits the returned fields (e.g. {'validators': 0}).
+        """
+        collection = self.database['daily_validator_stats']
+        query = {}
+        if start_date is not None or end_date is not None:
+            query['_id'] = {}
+            if start_date is not None:
+                query['_id']['$gte'] = start_date
+            if end_date is not None:
+                query['_id']['$lte'] = end_date
+        if start_height is not None:
+            query['date_start_height'] = {'$gte': start_height}
+        if end_height is not None:
+            query['date_end_height'] = {'$lte': end_height}
+
+        return collection.find(query, projection).sort('_id', 1).batch_size(batch_size)
+
+    async def get_validator_stats_days(self, **filters) -> list[dict]:
+        """Returns the days of iter_validator_stats_days(**filters) as a list."""
+        docs = await self.iter_validator_stats_days(**filters).to_list(length=None)
         log.info(f"Fetched {len(docs)} days")
         return docs
 
@@ -106,17 +526,25 @@ class MongoDBHandler:
         )
         log.info(f"Inserted new slash for {valoper} at height {height}")
 
-    async def get_slashes(self) -> list[dict]:
+    def iter_slashes(self, valopers: list[str] = None, projection: dict = None, batch_size: int = 100) -> motor.motor_asyncio.AsyncIOMotorCursor:
+        """Streams slashes documents, optionally only those of valopers."""
         collection = self.database['slashes']
-        cursor = collection.find({})
-        docs = await cursor.to_list(length=None)
+        query = {'_id': {'$in': valopers}} if valopers is not None else {}
+        return collection.find(query, projection).batch_size(batch_size)
+
+    async def get_slashes(self, **filters) -> list[dict]:
+        docs = await self.iter_slashes(**filters).to_list(length=None)
         log.info(f"Fetched {len(docs)} slashes")
         return docs
-    
-    async def get_processed_proposals(self) -> list[dict]:
+
+    def iter_processed_proposals(self, proposal_ids: list = None, projection: dict = None, batch_size: int = 100) -> motor.motor_asyncio.AsyncIOMotorCursor:
+        """Streams governance documents, optionally only those of proposal_ids. Use {'_id': 1} to skip the votes."""
         collection = self.database['governance']
-        cursor = collection.find({})
-        docs = await cursor.to_list(length=None)
+        query = {'_id': {'$in': proposal_ids}} if proposal_ids is not None else {}
+        return collection.find(query, projection).batch_size(batch_size)
+
+    async def get_processed_proposals(self, **filters) -> list[dict]:
+        docs = await self.iter_processed_proposals(**filters).to_list(length=None)
         log.info(f"Fetched {len(docs)} processed proposals")
         return docs
 
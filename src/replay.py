@@ -0,0 +1,170 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date as Date, timedelta
+from sys import exit
+from typing import Literal
+
+from utils.config import Config
+from utils.logger import log
+
+from src.block_cache import BlockCache
+from src.blocks import Blocks
+from src.mongodb import MongoDBHandler
+
+class ReplayBlocks(Blocks):
+    """
+    Blocks pipeline over stored days, fed from local data instead of the RPC.
+
+    With source 'cache' every day goes through the same stream_blocks -> parse_blocks_batches -> aggregate_blocks path
+    as a live run, reading /commit and /block responses from the block cache. With source 'bitmaps' the stored bitmap
+    runs are unpacked and handed to aggregate_blocks directly. Finished days are collected instead of inserted.
+    """
+
+    def __init__(
+        self,
+        config: Config,
+        mongo: MongoDBHandler,
+        source: Literal['cache', 'bitmaps'],
+        days: list[dict],
+        block_cache: BlockCache = None
+    ):
+        super().__init__(config=config, aio_session=None, mongo=mongo)
+        self.source = source
+        self.days = days
+        self.block_cache = block_cache
+        self.app_blocks_batch_size = config.blocks_batch_size
+        self.checkpoint_interval = 0
+        self.replayed_days = []
+
+    async def replay(self) -> list[dict]:
+        for day in self.days:
+            self.app_start_height = self.day_start_height = day['date_start_height']
+            self.app_end_height = day['date_end_height'] + 1
+            self.app_current_date = day['_id']
+
+            if self.source == 'bitmaps':
+                await self.replay_bitmaps(day=day)
+            else:
+                await self.parse_blocks_batches()
+
+            await self.store_day()
+            self.validators.clear()
+        return self.replayed_days
+
+    async def replay_bitmaps(self, day: dict):
+        runs = await self.mongo.get_block_bitmaps(start_height=day['date_start_height'], end_height=day['date_end_height'])
+        blocks = []
+        bitmaps = []
+        for run in runs:
+            valset = await self.get_cached_valset(height=run['start_height'], validators_hash=run['validators_hash'])
+            if not valset:
+                exit(5)
+            for block_bitmaps in self.validators.unpack_run(run=run, valset=valset):
+                blocks.append({"height": block_bitmaps['height'], "time": None, "date": day['_id']})
+                bitmaps.append(block_bitmaps)
+
+        expected = day['date_end_height'] - day['date_start_height'] + 1
+        if len(bitmaps) != expected:
+            log.error(f"Stored block_bitmaps of {day['_id']} cover {len(bitmaps)} of {expected} blocks. Replay it from the block cache instead\nExiting")
+            exit(5)
+        await self.aggregate_blocks(blocks=blocks, bitmaps=bitmaps)
+
+    async def get_shared_commit(self, height: int):
+        return self.read_cache(kind='commit', height=height)
+
+    async def get_shared_block_details(self, height: int):
+        return self.read_cache(kind='block', height=height)
+
+    def read_cache(self, kind: str, height: int):
+        data = self.block_cache.get(kind, height)
+        if not data:
+            log.error(f"Block {height} ({kind}) is missing from the block cache. Replay needs every height of the day cached")
+        return data
+
+    def prefetch_heights(self, heights: list[int]):
+        pass
+
+    async def load_valset(self, height: int, validators_hash: str):
+        valset = await self.mongo.get_valset(validators_hash=validators_hash)
+        if not valset:
+            log.error(f"Valset {validators_hash} of block {height} is not stored in MongoDB. Replay needs persist_valsets enabled during ingestion")
+        return valset
+
+    async def write_day(
+        self,
+        date: str,
+        date_start_height: int,
+        date_end_height: int,
+        stats: dict,
+        runs: list[dict] = None,
+        times: list[str] = None
+    ):
+        # Block times do not depend on aggregation rules, the height_index written during ingestion stays as is
+        self.replayed_days.append({
+            '_id': date,
+            'date_start_height': date_start_height,
+            'date_end_height': date_end_height,
+            'validators': stats,
+        })
+
+        if runs is not None and self.source == 'cache':
+            await self.mongo.insert_block_bitmaps(date=date, runs=runs)
+
+async def replay_days(config: Config, source: str, days: list[dict]) -> int:
+    block_cache = BlockCache(path=config.block_cache_dir, read_only=True) if source == 'cache' else None
+    try:
+        async with MongoDBHandler(config) as mongo:
+            replayed_days = await ReplayBlocks(config=config, mongo=mongo, source=source, days=days, block_cache=block_cache).replay()
+            await mongo.replace_daily_validator_stats(days=replayed_days)
+    finally:
+        if block_cache:
+            block_cache.close()
+    return len(replayed_days)
+
+def replay_shard(config: Config, source: str, days: list[dict]) -> int:
+    """Process pool entry point. Every shard runs its own event loop, MongoDB client and block cache reader."""
+    return asyncio.run(replay_days(config=config, source=source, days=days))
+
+class Replay:
+    """Recomputes stored daily_validator_stats from local data, one worker process per contiguous shard of days."""
+
+    def __init__(self, config: Config, mongo: MongoDBHandler, source: Literal['cache', 'bitmaps']):
+        self.config = config
+        self.mongo = mongo
+        self.source = source
+        self.workers = config.decode_workers or max(1, os.cpu_count() - 1)
+
+    async def start(self):
+        if self.source == 'cache' and not self.config.block_cache_dir:
+            log.error("Replay from cache needs block_cache_dir in config")
+            exit(5)
+
+        days = await self.mongo.get_day_ranges(
+            start_height=None if self.config.start_height == 'auto' else self.config.start_height,
+            **self.end_bound()
+        )
+        if not days:
+            log.warning("No stored days to replay in the configured height range")
+            return
+
+        workers = min(self.workers, len(days))
+        shards = [days[i * len(days) // workers:(i + 1) * len(days) // workers] for i in range(workers)]
+        log.info(f"Replaying {len(days)} days ({days[0]['_id']} -> {days[-1]['_id']}) from {self.source} on {workers} workers")
+
+        loop = asyncio.get_running_loop()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            replayed = await asyncio.gather(*(
+                loop.run_in_executor(executor, replay_shard, self.config, self.source, shard)
+                for shard in shards
+            ))
+        log.info(f"Replay finished. Rewrote {sum(replayed)} days")
+        await self.mongo.rebuild_rollups()
+
+    def end_bound(self) -> dict:
+        """Turns end_height into a get_day_ranges() filter. An end date replays the stored days before it, like a live run stops at it."""
+        if self.config.end_height == 'auto':
+            return {}
+        if isinstance(self.config.end_height, Date):
+            return {'end_date': (self.config.end_height - timedelta(days=1)).isoformat()}
+        return {'end_height': self.config.end_height}
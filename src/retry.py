@@ -0,0 +1,49 @@
+import asyncio
+import random
+import time
+
+class RetryBudget:
+    """
+    Token bucket shared by all retries of a session.
+
+    Every successful call deposits `ratio` tokens, `refill` tokens are added per second and every retry
+    withdraws one. Once the initial `capacity` is spent, retries are limited to ~ratio of the successful traffic
+    plus `refill` per second. A retry that finds the bucket empty waits for its token instead of giving up,
+    so a flaky node slows retries down rather than failing requests.
+    """
+
+    def __init__(self, ratio: float = 0.2, capacity: int = 20, refill: float = 1.0):
+        self.ratio = ratio
+        self.capacity = capacity
+        self.refill = refill
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.exhausted = 0
+
+    def refill_tokens(self):
+        now = time.monotonic()
+        self.tokens = min(self.tokens + (now - self.updated) * self.refill, self.capacity)
+        self.updated = now
+
+    def deposit(self):
+        self.refill_tokens()
+        self.tokens = min(self.tokens + self.ratio, self.capacity)
+
+    async def withdraw(self) -> float:
+        """Takes one token, waiting while the bucket is empty. Returns the seconds waited."""
+        self.refill_tokens()
+        if self.tokens < 1:
+            self.exhausted += 1
+
+        waited = 0.0
+        while self.tokens < 1:
+            delay = (1 - self.tokens) / self.refill
+            await asyncio.sleep(delay)
+            waited += delay
+            self.refill_tokens()
+        self.tokens -= 1
+        return waited
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Exponential backoff with full jitter: uniform(0, min(cap, base * 2^attempt))."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
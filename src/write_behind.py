@@ -0,0 +1,68 @@
+import asyncio
+
+from utils.logger import log
+
+from src.mongodb import MongoDBHandler
+
+class WriteBehind:
+    """
+    Background MongoDB writer for finished days and checkpoints, so ingestion keeps fetching during a flush.
+
+    Writes are applied strictly in the order they were queued. Consecutive days are coalesced into one bulk upsert
+    per collection followed by a single lock update, so the lock never points past a day that is not stored.
+    Of consecutive checkpoints only the newest is written. At most max_pending writes wait in the queue, after
+    that put() waits for the writer.
+    """
+
+    def __init__(self, mongo: MongoDBHandler, chain_id: str, max_pending: int = 8):
+        self.mongo = mongo
+        self.chain_id = chain_id
+        self.queue = asyncio.Queue(maxsize=max_pending)
+        self.task = None
+
+    async def put(self, kind: str, write: dict):
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+        if self.task.done():
+            # The writer stopped on an error, nothing queued from now on would be written
+            self.task.result()
+
+        put = asyncio.ensure_future(self.queue.put((kind, write)))
+        await asyncio.wait([put, self.task], return_when=asyncio.FIRST_COMPLETED)
+        if not put.done():
+            put.cancel()
+            self.task.result()
+
+    async def run(self):
+        while True:
+            writes = [await self.queue.get()]
+            while not self.queue.empty():
+                writes.append(self.queue.get_nowait())
+
+            for kind, group in self.group(writes):
+                if kind is None:
+                    return
+                if kind == 'day':
+                    await self.mongo.write_days(days=group, chain_id=self.chain_id)
+                elif kind == 'checkpoint':
+                    await self.mongo.update_checkpoint(**group[-1])
+
+    @staticmethod
+    def group(writes: list[tuple]) -> list[tuple]:
+        groups = []
+        for kind, write in writes:
+            if groups and groups[-1][0] == kind:
+                groups[-1][1].append(write)
+            else:
+                groups.append((kind, [write]))
+        return groups
+
+    async def close(self):
+        """Flushes everything queued and stops the writer, raising the error that stopped it, if any."""
+        if self.task is None:
+            return
+        if not self.task.done():
+            await self.put(None, None)
+        await self.task
+        self.task = None
+        log.info("🛑 Write-behind queue flushed.")
@@ -0,0 +1,4 @@
+import sys
+
+# utils.args parses the command line on import, the modules under test expect a subcommand
+sys.argv = [sys.argv[0], "blocks"]
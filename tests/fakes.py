@@ -0,0 +1,24 @@
+from datetime import date, timedelta
+
+BLOCKS_PER_DAY = 10
+CHAIN_TIP = 100
+
+def block_date(height: int) -> str:
+    return (date(2025, 1, 1) + timedelta(days=(height - 1) // BLOCKS_PER_DAY)).isoformat()
+
+def block_time(height: int) -> str:
+    return f"{block_date(height)}T{(height - 1) % BLOCKS_PER_DAY:02d}:00:00.123456789Z"
+
+class FakeSession:
+    """Chain of CHAIN_TIP heights with BLOCKS_PER_DAY blocks per UTC day, starting 2025-01-01 at height 1."""
+
+    def __init__(self):
+        self.requests = 0
+
+    async def fetch_with_retry(self, description, request):
+        return await request()
+
+    async def get_block(self, height: int):
+        self.requests += 1
+        if 1 <= height <= CHAIN_TIP:
+            return {'result': {'signed_header': {'header': {'time': block_time(height)}}}}
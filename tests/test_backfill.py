@@ -0,0 +1,72 @@
+import asyncio
+
+from src.backfill import Backfill, stitch_days
+from src.block_times import BlockTimes
+
+from tests.fakes import CHAIN_TIP, FakeSession
+
+def counters(signed: int, missed: int) -> dict:
+    return {
+        'signed_blocks': signed,
+        'missed_blocks': missed,
+        'proposed_blocks': 0,
+        'signed_oracle': signed,
+        'missed_oracle': missed,
+    }
+
+def partial_day(start_height: int, end_height: int, stats: dict, runs: list = None) -> dict:
+    return {
+        'date': '2025-01-04',
+        'date_start_height': start_height,
+        'date_end_height': end_height,
+        'stats': stats,
+        'runs': runs,
+        'times': [f"t{height}" for height in range(start_height, end_height + 1)],
+    }
+
+def test_stitch_days_joins_both_halves():
+    first = partial_day(31, 34, {'AA': counters(3, 1)}, runs=[{'start_height': 31}])
+    second = partial_day(35, 40, {'AA': counters(6, 0), 'BB': counters(2, 4)}, runs=[{'start_height': 35}])
+
+    day = stitch_days(first, second)
+
+    assert (day['date'], day['date_start_height'], day['date_end_height']) == ('2025-01-04', 31, 40)
+    assert day['stats'] == {'AA': counters(9, 1), 'BB': counters(2, 4)}
+    assert day['runs'] == [{'start_height': 31}, {'start_height': 35}]
+    assert day['times'] == [f"t{height}" for height in range(31, 41)]
+    # The halves are left as they were
+    assert first['stats'] == {'AA': counters(3, 1)}
+
+def test_stitch_days_without_bitmaps():
+    day = stitch_days(partial_day(31, 34, {}), partial_day(35, 40, {}))
+    assert day['runs'] is None
+
+def test_stitch_day_longer_than_a_shard():
+    # A day split over three shards is stitched pairwise in height order
+    parts = [partial_day(31, 33, {'AA': counters(3, 0)}), partial_day(34, 36, {'AA': counters(2, 1)}), partial_day(37, 40, {'AA': counters(4, 0)})]
+    day = parts[0]
+    for part in parts[1:]:
+        day = stitch_days(day, part)
+
+    assert (day['date_start_height'], day['date_end_height']) == (31, 40)
+    assert day['stats'] == {'AA': counters(9, 1)}
+    assert len(day['times']) == 10
+
+def shard_bounds(start_height: int, end_height: int, shards: int) -> list[int]:
+    backfill = Backfill.__new__(Backfill)
+    backfill.app_start_height = start_height
+    backfill.app_end_height = end_height
+    backfill.shards = shards
+    backfill.block_times = BlockTimes(aio_session=FakeSession())
+    return asyncio.run(backfill.shard_bounds())
+
+def test_shard_bounds_start_at_day_boundaries():
+    assert shard_bounds(start_height=1, end_height=CHAIN_TIP, shards=4) == [1, 21, 41, 71, CHAIN_TIP]
+
+def test_shard_bounds_skip_shards_inside_one_day():
+    # Every split point falls into the day of heights 31..40, so no shard is left apart from the first one
+    assert shard_bounds(start_height=31, end_height=39, shards=4) == [31, 39]
+
+def test_shard_bounds_with_partial_first_day():
+    # The first shard starts mid-day, the next one at the following day boundary
+    assert shard_bounds(start_height=35, end_height=CHAIN_TIP, shards=2) == [35, 61, CHAIN_TIP]
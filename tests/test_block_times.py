@@ -0,0 +1,44 @@
+import asyncio
+
+from src.block_times import BlockTimes, pack_times, time_at, time_of_day_ms
+
+from tests.fakes import CHAIN_TIP, FakeSession, block_time
+
+def first_height_of_date(date: str, low: int, high: int, block_times: BlockTimes = None) -> int:
+    block_times = block_times or BlockTimes(aio_session=FakeSession())
+    return asyncio.run(block_times.first_height_of_date(date=date, low=low, high=high))
+
+def test_first_height_of_date():
+    assert first_height_of_date('2025-01-04', low=1, high=CHAIN_TIP) == 31
+
+def test_first_height_of_partial_first_day():
+    # low is in the middle of the day, so the day starts at low
+    assert first_height_of_date('2025-01-04', low=35, high=CHAIN_TIP) == 35
+    assert first_height_of_date('2025-01-03', low=35, high=CHAIN_TIP) == 35
+
+def test_first_height_of_date_past_chain_tip():
+    block_times = BlockTimes(aio_session=FakeSession())
+    height = first_height_of_date('2025-02-01', low=1, high=CHAIN_TIP, block_times=block_times)
+    # high is returned and its date is still before the requested one, callers check that
+    assert height == CHAIN_TIP
+    assert asyncio.run(block_times.get_date(height=height)) < '2025-02-01'
+
+def test_first_height_of_date_narrows_by_cached_heights():
+    session = FakeSession()
+    block_times = BlockTimes(aio_session=session)
+    for height in (25, 29, 31, 40):
+        block_times.add(height=height, time=block_time(height))
+
+    assert first_height_of_date('2025-01-04', low=1, high=CHAIN_TIP, block_times=block_times) == 31
+    # Only 30 is left between the cached 29 and 31
+    assert session.requests == 1
+
+def test_time_of_day_ms():
+    assert time_of_day_ms('2025-01-01T12:34:56.789123456Z') == ((12 * 60 + 34) * 60 + 56) * 1000 + 789
+    assert time_of_day_ms('2025-01-01T00:00:01.7Z') == 1700
+    assert time_of_day_ms('2025-01-01T00:00:01Z') == 1000
+
+def test_time_at_unpacks_packed_times():
+    times = [block_time(height) for height in range(11, 21)]
+    day = {'_id': '2025-01-02', 'start_height': 11, 'times': pack_times(times)}
+    assert [time_at(day=day, height=height) for height in range(11, 21)] == [time[:23] + 'Z' for time in times]
@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+from src.write_behind import WriteBehind
+
+class FakeMongo:
+    def __init__(self, fail_on: str = None):
+        self.writes = []
+        self.fail_on = fail_on
+
+    async def write_days(self, days: list[dict], chain_id: str):
+        await asyncio.sleep(0)
+        if self.fail_on in [day['date'] for day in days]:
+            raise RuntimeError(f"failed to write {self.fail_on}")
+        self.writes.append(('days', [day['date'] for day in days]))
+
+    async def update_checkpoint(self, **checkpoint):
+        self.writes.append(('checkpoint', checkpoint['height']))
+
+def test_writes_keep_queue_order_and_coalesce():
+    async def run():
+        mongo = FakeMongo()
+        writer = WriteBehind(mongo=mongo, chain_id='test-1')
+        await writer.put('checkpoint', {'height': 5})
+        for day in ('2025-01-01', '2025-01-02'):
+            await writer.put('day', {'date': day})
+        await writer.put('checkpoint', {'height': 25})
+        await writer.put('checkpoint', {'height': 27})
+        await writer.close()
+        return mongo.writes
+
+    writes = asyncio.run(run())
+    # Days are never reordered around checkpoints, consecutive days may share one bulk write
+    values = [value for kind, written in writes for value in (written if kind == 'days' else [written])]
+    assert values[:3] == [5, '2025-01-01', '2025-01-02']
+    # Of the checkpoints queued back to back only the newest has to be written
+    assert values[3:] in ([27], [25, 27])
+
+def test_put_after_a_failed_write_raises():
+    async def run():
+        mongo = FakeMongo(fail_on='2025-01-01')
+        writer = WriteBehind(mongo=mongo, chain_id='test-1')
+        await writer.put('day', {'date': '2025-01-01'})
+        while not writer.task.done():
+            await asyncio.sleep(0)
+        await writer.put('day', {'date': '2025-01-02'})
+
+    with pytest.raises(RuntimeError, match='2025-01-01'):
+        asyncio.run(run())
+
+def test_close_raises_the_write_error():
+    async def run():
+        writer = WriteBehind(mongo=FakeMongo(fail_on='2025-01-02'), chain_id='test-1')
+        for day in ('2025-01-01', '2025-01-02', '2025-01-03'):
+            await writer.put('day', {'date': day})
+        await writer.close()
+
+    with pytest.raises(RuntimeError, match='2025-01-02'):
+        asyncio.run(run())
@@ -35,10 +35,27 @@ def parse_args():
     subparsers = parser.add_subparsers(dest="subcommand", required=True)
 
     # Blocks subcommand
-    subparsers.add_parser(
+    blocks_parser = subparsers.add_parser(
         "blocks",
         help="Start the Blocks processor (fetch blocks, signatures, etc.)"
     )
+    blocks_parser.add_argument(
+        "--replay",
+        type=str,
+        choices=["cache", "bitmaps"],
+        help="Recompute the stored daily_validator_stats from local data instead of the RPC: 'cache' (block_cache_dir) or 'bitmaps' (block_bitmaps collection)."
+    )
+    blocks_parser.add_argument(
+        "--shards",
+        type=int,
+        default=0,
+        help="Split [start_height, end_height) into this many shards, each backfilled by its own process and RPC session."
+    )
+    blocks_parser.add_argument(
+        "--rebuild-rollups",
+        action="store_true",
+        help="Recompute the weekly, monthly and all-time validator rollups from daily_validator_stats and exit."
+    )
 
     # Metrics subcommand with --metric flag
     metrics_parser = subparsers.add_parser(
@@ -1,4 +1,7 @@
-from pydantic import BaseModel
+import re
+from datetime import date
+from typing import Literal
+from pydantic import BaseModel, field_validator
 
 class DB(BaseModel):
     username: str
@@ -7,15 +10,58 @@ class DB(BaseModel):
     port: int
     db_name: str
 
+class Http(BaseModel):
+    timeout: int = 10
+    connect_timeout: int = 5
+    pool_size: int = 100
+    pool_size_per_host: int = 0
+    keepalive_timeout: int = 30
+    dns_cache_ttl: int = 300
+    retry_attempts: int = 5
+    retry_base_delay: float = 0.1
+    retry_max_delay: float = 5.0
+    retry_budget_ratio: float = 0.2
+    retry_budget_capacity: int = 20
+    retry_budget_refill: float = 1.0
+    circuit_failures: int = 5
+    circuit_cooldown: float = 30
+    json_decoder: Literal['auto', 'orjson', 'json'] = 'auto'
+    partial_json: bool = True
+
+class Concurrency(BaseModel):
+    enabled: bool = True
+    min_in_flight: int = 10
+    max_in_flight: int = 1000
+    decrease_factor: float = 0.5
+    latency_tolerance: float = 3.0
+
 class Config(BaseModel):
-    rpc: str
-    api: str
+    rpc: str | list[str]
+    api: str | list[str]
     bech_32_prefix: str
     chain_id: str
     blocks_batch_size: int
-    sleep_between_blocks_batch: int
+    sleep_between_blocks_batch: int = 0
     metrics_batch_size: int
     multiprocessing: bool
-    start_height: int | str
-    end_height: int | str
-    db: DB
\ No newline at end of file
+    decode_workers: int | None = None
+    decode_chunks_per_worker: int = 2
+    persist_valsets: bool = False
+    store_block_bitmaps: bool = False
+    block_cache_dir: str | None = None
+    checkpoint_interval: int = 1000
+    blocks_fetch_mode: Literal['commit', 'block'] = 'commit'
+    rpc_batch_size: int = 0
+    start_height: int | Literal['auto']
+    # A UTC date (YAML reads an unquoted YYYY-MM-DD as a date as well) stops after the day before it
+    end_height: int | Literal['auto'] | date
+    db: DB
+    http: Http = Http()
+    concurrency: Concurrency = Concurrency()
+
+    @field_validator('end_height', mode='before')
+    @classmethod
+    def check_end_date(cls, value):
+        if isinstance(value, str) and value != 'auto' and not re.fullmatch(r'\d+|\d{4}-\d{2}-\d{2}', value):
+            raise ValueError(f"end_height must be a height, 'auto' or a UTC date as YYYY-MM-DD, got {value!r}")
+        return value
\ No newline at end of file